@@ -0,0 +1,164 @@
+from datetime import date, timedelta
+
+from availability import as_date, clip
+
+try:
+	import numpy as np
+except ImportError:  # pure-Python lists do the same job, just slower on big windows
+	np = None
+
+
+# Occupancy and revenue per van and month.
+#
+# Every van gets three per-day arrays over the [start, end) window: nights
+# blocked on Airbnb (iCal), nights taken by confirmed direct bookings, and
+# direct-booking revenue (each booking's total spread evenly over its nights).
+# Monthly figures are sums over slices of those arrays:
+#   occupancy = nights blocked or booked / nights in month
+#   adr       = direct revenue / direct nights (average daily rate)
+#   revenue   = direct revenue
+# Airbnb payouts are not in the feed, so Airbnb nights count towards
+# occupancy only.
+
+
+def default_window(today=None):
+	# The last twelve months, current month included
+	today = today or date.today()
+	end = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+	return date(end.year - 1, end.month, 1), end
+
+
+def month_bounds(start, end):
+	# (label, first index) for each calendar month touching the window, plus the end index
+	labels, bounds = [], []
+	day = start
+	while day < end:
+		labels.append(day.strftime('%Y-%m'))
+		bounds.append((day - start).days)
+		day = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+	bounds.append((end - start).days)
+	return labels, bounds
+
+
+def _zeros(n, dtype):
+	if np is not None:
+		return np.zeros(n, dtype=dtype)
+	return [dtype(0)] * n
+
+
+def _fill(arr, i, j, value):
+	if np is not None:
+		arr[i:j] = value
+	else:
+		arr[i:j] = [value] * (j - i)
+
+
+def _add(arr, i, j, value):
+	if np is not None:
+		arr[i:j] += value
+	else:
+		for k in range(i, j):
+			arr[k] += value
+
+
+def _union(a, b):
+	if np is not None:
+		return np.maximum(a, b)
+	return [max(x, y) for x, y in zip(a, b)]
+
+
+def _month_sums(arr, bounds):
+	if np is not None:
+		return np.add.reduceat(arr, bounds[:-1]).tolist() if len(arr) else []
+	return [sum(arr[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+
+def van_arrays(busy, bookings, start, end):
+	# Per-day (blocked, booked, revenue) arrays for one van
+	n = (end - start).days
+	blocked = _zeros(n, int)
+	booked = _zeros(n, int)
+	revenue = _zeros(n, float)
+	for s, e in clip(busy, start, end):
+		_fill(blocked, (s - start).days, (e - start).days, 1)
+	for b in bookings:
+		try:
+			s, e = as_date(b.get('start')), as_date(b.get('end'))
+			total = float(b.get('total') or 0)
+		except (TypeError, ValueError):
+			continue
+		nights = (e - s).days
+		if nights <= 0:
+			continue
+		for cs, ce in clip([(s, e)], start, end):
+			i, j = (cs - start).days, (ce - start).days
+			_fill(booked, i, j, 1)
+			_add(revenue, i, j, total / nights)
+	return blocked, booked, revenue
+
+
+def summarize(month, days, occupied, booked, revenue):
+	return {
+		'month': month,
+		'days': days,
+		'occupiedNights': occupied,
+		'bookedNights': booked,
+		'revenue': round(revenue, 2),
+		'occupancy': round(occupied / days, 4) if days else None,
+		'adr': round(revenue / booked, 2) if booked else None,
+	}
+
+
+def monthly(labels, bounds, blocked, booked, revenue):
+	days = [b - a for a, b in zip(bounds, bounds[1:])]
+	occupied = _month_sums(_union(blocked, booked), bounds)
+	nights = _month_sums(booked, bounds)
+	money = _month_sums(revenue, bounds)
+	return [summarize(*row) for row in zip(labels, days, occupied, nights, money)]
+
+
+def total(label, rows):
+	return summarize(label, *(sum(r[k] for r in rows) for k in ('days', 'occupiedNights', 'bookedNights', 'revenue')))
+
+
+def build(vans, busy_by_slug, bookings, start, end):
+	# vans: catalog Van objects; busy_by_slug: merged (start, end) pairs per slug;
+	# bookings: confirmed booking messages
+	labels, bounds = month_bounds(start, end)
+	by_slug = {}
+	for b in bookings:
+		by_slug.setdefault(b.get('slug'), []).append(b)
+	out_vans = []
+	fleet = {}
+	for van in vans:
+		arrays = van_arrays(busy_by_slug.get(van.slug) or [], by_slug.get(van.slug) or [], start, end)
+		months = monthly(labels, bounds, *arrays)
+		for row in months:
+			fleet.setdefault(row['month'], []).append(row)
+		out_vans.append({ 'slug': van.slug, 'name': van.name, 'months': months, 'total': total('total', months) })
+	fleet_months = [total(label, fleet.get(label) or []) for label in labels]
+	return {
+		'from': start.isoformat(),
+		'to': end.isoformat(),
+		'engine': 'numpy' if np is not None else 'python',
+		'vans': out_vans,
+		'fleet': { 'months': fleet_months, 'total': total('total', fleet_months) },
+	}
+
+
+class FleetAnalytics:
+	# Keeps recent results keyed on everything they were computed from, so
+	# repeated dashboard loads are free until the catalog, messages.json or
+	# an iCal feed changes
+	def __init__(self, size=8):
+		self.size = size
+		self.results = {}
+
+	def get(self, key, compute):
+		result = self.results.get(key)
+		if result is None:
+			result = compute()
+			if len(self.results) >= self.size:
+				self.results.pop(next(iter(self.results)))
+			self.results[key] = result
+		return result
@@ -1,54 +1,186 @@
-from flask import Flask, jsonify, send_from_directory, request, make_response, redirect
+import click
+from flask import Flask, Request, current_app, jsonify, send_from_directory, request, make_response, redirect, Response, stream_with_context
+import atexit
+import csv
+import hashlib
+import heapq
+import itertools
 import json
 import os
-import requests
-from icalendar import Calendar
-from datetime import datetime
-from dateutil import tz
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
 import re
+import tempfile
+from werkzeug.exceptions import RequestEntityTooLarge
 
-# Try to import email validator, fall back to simple regex if not available
-try:
-	from email_validator import validate_email, EmailNotValidError
-	EMAIL_VALIDATOR_AVAILABLE = True
-except ImportError:
-	EMAIL_VALIDATOR_AVAILABLE = False
-	def validate_email(email):
-		# Simple email regex fallback
-		pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-		if not re.match(pattern, email):
-			raise ValueError("Invalid email format")
+from availability import MAX_WINDOW_DAYS, as_date, merge as merge_ranges, parse_window, window_payload
+from cache import make_cache
+from catalog import VanCatalog
+from changefeed import ChangeFeed
+from compression import init_compression
+from hints import PageHints
+from hll import HyperLogLog, merged
+import icalstream
+from search import MessageSearch
+from storage import locked, write_json
+from visitlog import VisitLog, time_bound
+
+# Heavy dependencies (requests, icalendar, dateutil, smtplib/email.mime,
+# email_validator, stripe) are imported inside the functions that use them,
+# so workers that only serve pages and /api/vans never load them.
+# tools/startup_bench.py keeps an eye on this.
+
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
+class EmailNotValidError(ValueError):
+	pass
+
+
+def validate_email(email):
+	# Uses email_validator when installed, otherwise a simple regex check
+	try:
+		import email_validator
+	except ImportError:
+		if not EMAIL_RE.match(email or ''):
+			raise EmailNotValidError("Invalid email format")
 		return email
-	class EmailNotValidError(Exception):
-		pass
+	try:
+		return email_validator.validate_email(email)
+	except email_validator.EmailNotValidError as e:
+		raise EmailNotValidError(str(e)) from e
 
-app = Flask(__name__, static_folder="static", template_folder="static")
 
-try:
-	import stripe
-except Exception:
-	stripe = None
+app = Flask(__name__, static_folder="static", template_folder="static")
+init_compression(app)
+# Upload limits: the whole request is refused up front from Content-Length, and each
+# file is cut off while it streams to disk (see UploadStream)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_REQUEST_BYTES', 40 * 1024 * 1024))
+app.config['MAX_UPLOAD_FILE_BYTES'] = int(os.environ.get('MAX_UPLOAD_FILE_BYTES', 15 * 1024 * 1024))
 
 
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
 STORE_PATH = os.path.join(os.path.dirname(__file__), 'messages.json')
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+IMAGES_DIR = os.path.join(STATIC_DIR, 'images')
+# content-addressed uploads: static/images/uploads/<2 hex>/<sha256 prefix>.<ext>
+UPLOADS_DIR = os.path.join(IMAGES_DIR, 'uploads')
+# uploads in progress; on the same filesystem as UPLOADS_DIR so finishing one is a rename,
+# but never served (dot paths under /static are refused) and swept by gc-images
+UPLOADS_TMP_DIR = os.path.join(UPLOADS_DIR, '.tmp')
+UPLOAD_PART_MAX_AGE = 3600
 STATS_PATH = os.path.join(os.path.dirname(__file__), 'stats.json')
+VISITS_DIR = os.path.join(os.path.dirname(__file__), 'visits')
+
+# Per-IP detail in stats.json is only kept for recent visitors; unique counts come from HLL sketches
+IP_DETAIL_DAYS = 30
+IP_DETAIL_MAX = 2000
+# Per-day unique sketches are kept this long, then merged into one sketch per month
+UNIQUE_DAYS_KEEP = 90
+
+# Raw visit events go to compressed, time-indexed segments instead of stats.json
+visit_log = VisitLog(VISITS_DIR)
+
+# Upstream results (iCal feeds, geo lookups, Stripe sessions) are cached in one SQLite
+# file shared by all workers; CACHE_BACKEND=memory keeps them per process instead
+CACHE_PATH = os.environ.get('CACHE_PATH') or os.path.join(os.path.dirname(__file__), 'cache.sqlite3')
+shared_cache = make_cache(os.environ.get('CACHE_BACKEND', 'sqlite'), CACHE_PATH)
+
+# Sequenced feed of new bookings/messages, status changes and stats snapshots for open admin tabs
+CHANGES_PATH = os.environ.get('CHANGES_PATH') or os.path.join(os.path.dirname(__file__), 'changes.sqlite3')
+STATS_SNAPSHOT_SECONDS = 10
+try:
+	change_feed = ChangeFeed(CHANGES_PATH)
+except Exception as e:
+	print(f"Change feed at {CHANGES_PATH} unavailable: {e}")
+	change_feed = None
+_last_stats_snapshot = 0
+
+
+# Warm-up hooks run once before the server accepts traffic (see serve.py);
+# shutdown hooks flush anything buffered in memory.
+WARMUP_HOOKS = []
+SHUTDOWN_HOOKS = [visit_log.flush]
+_ready = False
+
+
+def warmup_hook(fn):
+	WARMUP_HOOKS.append(fn)
+	return fn
+
+
+def warm_up():
+	global _ready
+	for hook in WARMUP_HOOKS:
+		started = time.time()
+		try:
+			hook()
+			print(f"Warm-up {hook.__name__}: {time.time() - started:.2f}s")
+		except Exception as e:
+			# a cold cache is not fatal; the route will fill it on first use
+			print(f"Warm-up {hook.__name__} failed: {e}")
+	_ready = True
+
+
+def flush_state():
+	for hook in SHUTDOWN_HOOKS:
+		try:
+			hook()
+		except Exception as e:
+			print(f"Shutdown {hook.__name__} failed: {e}")
+
+
+atexit.register(flush_state)
 
 
 def load_config():
-	config_path = os.path.join(os.path.dirname(__file__), "config.json")
-	if not os.path.exists(config_path):
+	if not os.path.exists(CONFIG_PATH):
 		return {"vans": [], "contact": {}, "email": {}, "stripe": {} }
-	with open(config_path, "r", encoding="utf-8") as f:
+	with open(CONFIG_PATH, "r", encoding="utf-8") as f:
 		return json.load(f)
 
 
 def save_config(cfg):
-	config_path = os.path.join(os.path.dirname(__file__), "config.json")
-	with open(config_path, "w", encoding="utf-8") as f:
-		json.dump(cfg, f, ensure_ascii=False, indent=2)
+	global _catalog
+	write_json(CONFIG_PATH, cfg)
+	_catalog = None
+
+
+_catalog = None
+
+
+def file_version(path):
+	# Cheap change marker for a data file: (mtime, size), or None if missing
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	return (st.st_mtime_ns, st.st_size)
+
+
+def config_version():
+	return file_version(CONFIG_PATH)
+
+
+def get_catalog():
+	# Van catalog for the current config.json, rebuilt only when the file changes
+	global _catalog
+	version = config_version()
+	catalog = _catalog
+	if catalog is None or catalog.version != version:
+		catalog = VanCatalog(load_config().get("vans", []), version)
+		_catalog = catalog
+	return catalog
+
+
+def van_position(vans, slug):
+	# Index of the van in a freshly loaded config["vans"] list, or None
+	van = get_catalog().get(slug)
+	if van and van.position < len(vans) and vans[van.position].get('slug') == slug:
+		return van.position
+	return None
 
 
 def is_admin(req):
@@ -68,40 +200,100 @@ def load_messages():
 
 
 
-def save_message(msg):
-	msgs = load_messages()
+def iter_messages(chunk_size=64 * 1024):
+	# Yields stored messages one at a time, decoding messages.json incrementally
+	# so exports do not hold the whole history in memory
+	if not os.path.exists(STORE_PATH):
+		return
+	decoder = json.JSONDecoder()
+	with open(STORE_PATH, 'r', encoding='utf-8') as f:
+		buf, pos, eof = '', 0, False
+		while True:
+			while pos < len(buf) and buf[pos] in ' \t\r\n,[':
+				pos += 1
+			if pos < len(buf) and buf[pos] == ']':
+				return
+			if pos < len(buf):
+				try:
+					obj, pos = decoder.raw_decode(buf, pos)
+					yield obj
+					continue
+				except ValueError:
+					pass  # object continues in the next chunk
+			if eof:
+				return
+			chunk = f.read(chunk_size)
+			eof = not chunk
+			buf = buf[pos:] + chunk
+			pos = 0
 
-	msgs.append(msg)
-	with open(STORE_PATH, 'w', encoding='utf-8') as f:
-		json.dump(msgs, f, ensure_ascii=False, indent=2)
+
+def save_message(msg):
+	with locked(STORE_PATH):
+		msgs = load_messages()
+		msgs.append(msg)
+		save_messages(msgs)
+	publish_change('booking' if msg.get('type') == 'booking' else 'message', { 'id': len(msgs) - 1, 'message': msg })
 
 
 def save_messages(msgs):
-	with open(STORE_PATH, 'w', encoding='utf-8') as f:
-		json.dump(msgs, f, ensure_ascii=False, indent=2)
+	# callers that loaded msgs hold locked(STORE_PATH) around the load and the save
+	write_json(STORE_PATH, msgs)
 
 
 def load_stats():
 	if not os.path.exists(STATS_PATH):
-		return { 'total': 0, 'pages': {}, 'ips': {}, 'log': [] }
+		return { 'total': 0, 'pages': {}, 'ips': {} }
 	try:
 		with open(STATS_PATH, 'r', encoding='utf-8') as f:
 			data = json.load(f)
 			data.setdefault('ips', {})
-			data.setdefault('log', [])
-			return data
 	except Exception:
-		return { 'total': 0, 'pages': {}, 'ips': {}, 'log': [] }
+		return { 'total': 0, 'pages': {}, 'ips': {} }
+	if 'log' in data:
+		# older stats.json files carried a rolling log; move it to the visit archive once
+		for entry in data.pop('log') or []:
+			visit_log.append(entry)
+		visit_log.flush()
+		save_stats(data)
+	if 'hll' not in data:
+		# unique counts are kept in HyperLogLog sketches; seed them once from the per-IP map
+		for ip, info in data['ips'].items():
+			for path in (info.get('pages') or {'/': 1}):
+				record_unique(data, ip, path, info.get('country') or 'Unknown', (info.get('last') or '')[:10] or None)
+		data.pop('unique_visitors', None)
+		data.pop('by_country_unique', None)
+	return data
 
 
 
 def save_stats(stats):
+	# callers hold locked(STATS_PATH) around load_stats() and this
+	write_json(STATS_PATH, stats)
+
+
+def publish_stats(stats, force=False):
+	# Stats summary for the change feed; visits only publish one every STATS_SNAPSHOT_SECONDS per worker
+	global _last_stats_snapshot
+	if force or time.time() - _last_stats_snapshot >= STATS_SNAPSHOT_SECONDS:
+		_last_stats_snapshot = time.time()
+		publish_change('stats', stats_summary(stats))
 
-	with open(STATS_PATH, 'w', encoding='utf-8') as f:
-		json.dump(stats, f, ensure_ascii=False, indent=2)
+
+def publish_change(kind, data):
+	# Best effort: a failed write to the feed must not fail the request that made the change
+	if change_feed is None:
+		return
+	try:
+		change_feed.append(kind, data)
+	except Exception as e:
+		print(f"Change feed error: {e}")
 
 
 def send_email(subject: str, body: str, from_email: str = None, to_email: str = None) -> bool:
+	import smtplib
+	from email.mime.text import MIMEText
+	from email.mime.multipart import MIMEMultipart
 	cfg = load_config().get("email", {})
 	host = cfg.get("smtpHost")
 	port = int(cfg.get("smtpPort" or 0))
@@ -151,29 +343,78 @@ def api_test_email():
 	return jsonify({ 'ok': bool(ok) })
 
 
+@app.route("/healthz")
+def healthz():
+	# Liveness: the process is up and serving requests
+	return jsonify({ 'ok': True })
+
+
+@app.route("/readyz")
+def readyz():
+	# Readiness: warm-up finished and the data files are usable
+	checks = { 'warmed_up': _ready }
+	try:
+		load_config()
+		checks['config'] = True
+	except Exception:
+		checks['config'] = False
+	checks['data_dir'] = os.access(os.path.dirname(STATS_PATH) or '.', os.W_OK)
+	ok = all(checks.values())
+	return jsonify({ 'ok': ok, 'checks': checks }), (200 if ok else 503)
+
+
+# Link: preload/preconnect entries per page, scanned from the static HTML at warm-up
+page_hints = PageHints(STATIC_DIR)
+HINT_PAGES = ('index.html', 'vans.html', 'van.html', 'contact.html', 'about.html')
+
+
+@warmup_hook
+def warm_page_hints():
+	for name in HINT_PAGES:
+		page_hints.get(name, file_version(os.path.join(STATIC_DIR, name)))
+
+
+def html_page(name, extra=()):
+	# The page with a Link header for its critical assets and API calls, sent first as
+	# 103 Early Hints when the server offers that (wsgi.early_hints)
+	links = list(extra) + page_hints.get(name, file_version(os.path.join(STATIC_DIR, name)))
+	if links:
+		early_hints = request.environ.get('wsgi.early_hints')
+		if callable(early_hints):
+			try:
+				early_hints([('Link', link) for link in links])
+			except Exception:
+				pass
+	resp = send_from_directory(app.static_folder, name)
+	if links:
+		resp.headers['Link'] = ', '.join(links)
+	return resp
+
+
 @app.route("/")
 def index():
-	return send_from_directory(app.static_folder, "index.html")
+	return html_page("index.html")
 
 
 @app.route("/vans")
 def vans_page():
-	return send_from_directory(app.static_folder, "vans.html")
+	return html_page("vans.html")
 
 
 @app.route("/van/<slug>")
 def van_page(slug):
-	return send_from_directory(app.static_folder, "van.html")
+	# van.js builds the bundle URL from the slug, so the scan can't see it
+	return html_page("van.html", [f"</api/vans/{quote(slug, safe='')}/bundle?format=bitmap>; rel=preload; as=fetch; crossorigin"])
 
 
 @app.route("/contact")
 def contact_page():
-	return send_from_directory(app.static_folder, "contact.html")
+	return html_page("contact.html")
 
 
 @app.route("/about")
 def about_page():
-	return send_from_directory(app.static_folder, "about.html")
+	return html_page("about.html")
 
 
 @app.route("/locations")
@@ -207,10 +448,13 @@ def admin_logout():
 	return resp
 
 
+def site_payload(cfg):
+	return { "contact": cfg.get("contact", {} ), "stripe": {"publicKey": (cfg.get("stripe", {}).get("publicKey") or "") } }
+
+
 @app.route("/api/site")
 def site_info():
-	cfg = load_config()
-	return jsonify({ "contact": cfg.get("contact", {} ), "stripe": {"publicKey": (cfg.get("stripe", {}).get("publicKey") or "") } })
+	return jsonify(site_payload(load_config()))
 
 
 @app.route("/api/site-content")
@@ -231,22 +475,23 @@ def update_site_content():
 		if not updates:
 			return jsonify({"error": "No updates provided"}), 400
 		
-		config = load_config()
+		with locked(CONFIG_PATH):
+			config = load_config()
 		
-		# Update the site_content section
-		if 'site_content' not in config:
-			config['site_content'] = {}
+			# Update the site_content section
+			if 'site_content' not in config:
+				config['site_content'] = {}
 		
-		# Deep merge the updates
-		for key, value in updates.items():
-			if isinstance(value, dict) and isinstance(config['site_content'].get(key), dict):
-				# Merge nested dictionaries
-				config['site_content'][key].update(value)
-			else:
-				config['site_content'][key] = value
+			# Deep merge the updates
+			for key, value in updates.items():
+				if isinstance(value, dict) and isinstance(config['site_content'].get(key), dict):
+					# Merge nested dictionaries
+					config['site_content'][key].update(value)
+				else:
+					config['site_content'][key] = value
 		
-		# Save updated config
-		save_config(config)
+			# Save updated config
+			save_config(config)
 		
 		return jsonify({"ok": True, "message": "Site content updated successfully"})
 	except Exception as e:
@@ -255,18 +500,40 @@ def update_site_content():
 
 @app.route("/api/vans")
 def vans():
-	config = load_config()
-	vans_out = []
-	for v in (config.get("vans", []) or []):
-		vv = dict(v)
-		if not vv.get('airbnbUrl'):
-			ical = vv.get('airbnbIcalUrl') or ''
-			import re
-			m = re.search(r"/ical/(\d+)", ical)
-			if m:
-				vv['airbnbUrl'] = f"https://www.airbnb.com/rooms/{m.group(1)}"
-		vans_out.append(vv)
-	return jsonify(vans_out)
+	return jsonify(get_catalog().payload)
+
+
+@app.route("/api/vans/<slug>")
+def van_detail(slug):
+	van = get_catalog().get(slug)
+	if not van:
+		return jsonify({"error": "unknown van" }), 404
+	return jsonify(van.payload)
+
+
+@app.route("/api/vans/<slug>/bundle")
+def van_bundle(slug):
+	# Everything the van page needs in one response: van record, availability and site info.
+	# Availability takes the same from/to/format arguments as /api/availability.
+	van = get_catalog().get(slug)
+	if not van:
+		return jsonify({"error": "unknown van" }), 404
+	try:
+		window = ical_window(request.args.get('from'), request.args.get('to'))
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
+	try:
+		availability_out = availability_payload(van, window, request.args.get('format'))
+	except Exception as e:
+		availability_out = { "slug": slug, "busy": [], "error": str(e) }
+	resp = jsonify({
+		"van": van.payload,
+		"availability": availability_out,
+		"site": site_payload(load_config()),
+	})
+	if 'error' not in availability_out:
+		resp.headers['Cache-Control'] = 'public, max-age=60'
+	return resp
 
 
 @app.route("/api/messages")
@@ -276,85 +543,379 @@ def api_messages():
 	return jsonify(load_messages())
 
 
+CHANGE_STREAM_SECONDS = 300
+CHANGE_POLL_SECONDS = 1.0
+CHANGE_HEARTBEAT_SECONDS = 15
+
+
+@app.route('/api/admin/changes')
+def admin_changes():
+	# Changes after ?since=SEQ, oldest first (at most ?limit=, default 500). Without since, just the
+	# current sequence. reset=true means the caller is too far behind and should reload everything.
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	if change_feed is None:
+		return jsonify({"error": "change feed unavailable"}), 503
+	try:
+		since = request.args.get('since')
+		limit = min(1000, max(1, int(request.args.get('limit') or 500)))
+		if since is None:
+			return jsonify({ 'seq': change_feed.latest(), 'changes': [], 'reset': False, 'more': False })
+		since = int(since)
+	except ValueError:
+		return jsonify({"error": "since and limit must be integers"}), 400
+	changes, complete = change_feed.since(since, limit)
+	if not complete:
+		return jsonify({ 'seq': change_feed.latest(), 'changes': [], 'reset': True, 'more': False })
+	seq = changes[-1]['seq'] if changes else since
+	return jsonify({ 'seq': seq, 'changes': changes, 'reset': False, 'more': len(changes) == limit })
+
+
+@app.route('/api/admin/changes/stream')
+def admin_changes_stream():
+	# Server-sent events: one event per change after Last-Event-ID / ?since= (default: from now on),
+	# named by kind (booking, message, status, stats). The stream ends after CHANGE_STREAM_SECONDS so
+	# it doesn't hold a worker thread forever; EventSource reconnects and resumes from the last id.
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	if change_feed is None:
+		return jsonify({"error": "change feed unavailable"}), 503
+	try:
+		since = int(request.headers.get('Last-Event-ID') or request.args.get('since') or change_feed.latest())
+	except ValueError:
+		return jsonify({"error": "since must be an integer"}), 400
+
+	def events():
+		seq = since
+		started = last_sent = time.time()
+		yield 'retry: 3000\n\n'
+		while time.time() - started < CHANGE_STREAM_SECONDS:
+			changes, complete = change_feed.since(seq)
+			if not complete:
+				yield f"event: reset\ndata: {json.dumps({ 'seq': change_feed.latest() })}\n\n"
+				return
+			for change in changes:
+				seq = change['seq']
+				yield f"id: {seq}\nevent: {change['kind']}\ndata: {json.dumps(change['data'], ensure_ascii=False)}\n\n"
+			if changes:
+				last_sent = time.time()
+			elif time.time() - last_sent >= CHANGE_HEARTBEAT_SECONDS:
+				# keeps proxies from closing an idle connection
+				yield ': keep-alive\n\n'
+				last_sent = time.time()
+			time.sleep(CHANGE_POLL_SECONDS)
+
+	resp = Response(stream_with_context(events()), mimetype='text/event-stream')
+	resp.headers['Cache-Control'] = 'no-cache'
+	resp.headers['X-Accel-Buffering'] = 'no'
+	return resp
+
+
+def record_ip_visit(stats, ip, path, ua, country):
+	ips = stats.get('ips') or {}
+	info = ips.get(ip) or { 'count': 0, 'pages': {}, 'last': None, 'ua': ua }
+	info['count'] = int(info.get('count',0)) + 1
+	pp = info.get('pages') or {}
+	pp[path] = int(pp.get(path,0)) + 1
+	info['pages'] = pp
+	info['last'] = datetime.utcnow().isoformat() + 'Z'
+	info['ua'] = ua or info.get('ua','')
+	# Ensure country is stored/updated for this IP (force set so it's included in saved stats)
+	info['country'] = country
+	ips[ip] = info
+	stats['ips'] = ips
+	record_unique(stats, ip, path, country)
+	if len(ips) > IP_DETAIL_MAX or stats.get('ips_pruned') != info['last'][:10]:
+		prune_ip_detail(stats)
+		roll_up_unique_days(stats)
+
+
+def record_unique(stats, ip, path, country, day=None):
+	# Adds the IP to the lifetime and per-day sketches (overall, per country, per page)
+	day = day or datetime.utcnow().strftime('%Y-%m-%d')
+	sketches = stats.setdefault('hll', {})
+	day_sketches = sketches.setdefault('days', {}).setdefault(day, {})
+	for scope in (sketches, day_sketches):
+		for group, key in ((None, 'all'), ('countries', country), ('pages', path)):
+			bucket = scope.setdefault(group, {}) if group else scope
+			h = HyperLogLog.loads(bucket.get(key))
+			if h.add(ip):
+				bucket[key] = h.dumps()
+
+
+def prune_ip_detail(stats):
+	# Keeps per-IP detail only for the last IP_DETAIL_DAYS days and at most IP_DETAIL_MAX entries
+	ips = stats.get('ips') or {}
+	today = datetime.utcnow()
+	cutoff = datetime.fromordinal(today.toordinal() - IP_DETAIL_DAYS).strftime('%Y-%m-%d')
+	recent = [(ip, info) for ip, info in ips.items() if (info.get('last') or '') >= cutoff]
+	if len(recent) > IP_DETAIL_MAX:
+		recent = heapq.nlargest(IP_DETAIL_MAX, recent, key=lambda kv: kv[1].get('last') or '')
+	stats['ips'] = dict(recent)
+	# geo lookup debug entries only for the IPs still kept
+	geo_debug = stats.get('geo_debug')
+	if geo_debug:
+		stats['geo_debug'] = { ip: d for ip, d in geo_debug.items() if ip in stats['ips'] }
+	stats['ips_pruned'] = today.strftime('%Y-%m-%d')
+
+
+def roll_up_unique_days(stats):
+	# Merges per-day sketches older than UNIQUE_DAYS_KEEP days into per-month sketches (hll.months)
+	sketches = stats.get('hll') or {}
+	days = sketches.get('days') or {}
+	cutoff = datetime.fromordinal(datetime.utcnow().toordinal() - UNIQUE_DAYS_KEEP).strftime('%Y-%m-%d')
+	old = [day for day in days if day < cutoff]
+	if not old:
+		return
+	months = sketches.setdefault('months', {})
+	for day in old:
+		d = days.pop(day)
+		month = months.setdefault(day[:7], {})
+		month['all'] = merged([month.get('all'), d.get('all')]).dumps()
+		for group in ('countries', 'pages'):
+			bucket = month.setdefault(group, {})
+			for key, text in (d.get(group) or {}).items():
+				bucket[key] = merged([bucket.get(key), text]).dumps()
+
+
+def unique_counts(sketches):
+	# Turns a {'all', 'countries', 'pages'} sketch group into plain counts
+	return {
+		'unique_visitors': HyperLogLog.loads(sketches.get('all')).count(),
+		'by_country_unique': { c: HyperLogLog.loads(t).count() for c, t in (sketches.get('countries') or {}).items() },
+		'by_page_unique': { p: HyperLogLog.loads(t).count() for p, t in (sketches.get('pages') or {}).items() },
+	}
+
+
+# Search index over messages.json, caught up with the file whenever it changes
+_message_search = MessageSearch()
+_message_search_version = None
+_message_search_lock = threading.Lock()
+
+
+@app.route('/api/admin/search')
+def admin_search():
+	# ?q= matches name, email, phone, notes, message text, van slug and dates (prefixes allowed);
+	# optional ?type=booking|message and ?status=; paginated with ?page=&per_page=
+	global _message_search_version
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	q = (request.args.get('q') or '').strip()
+	try:
+		page = max(1, int(request.args.get('page') or 1))
+		per_page = min(200, max(1, int(request.args.get('per_page') or 20)))
+	except ValueError:
+		return jsonify({"error": "page and per_page must be integers"}), 400
+	with _message_search_lock:
+		version = file_version(STORE_PATH)
+		if version != _message_search_version:
+			_message_search.sync(load_messages())
+			_message_search_version = version
+		results = _message_search.search(q, request.args.get('type'), request.args.get('status'))
+	items = [dict(msg, id=i) for i, msg in results[(page - 1) * per_page:page * per_page]]
+	return jsonify({ 'query': q, 'page': page, 'per_page': per_page, 'total': len(results), 'items': items })
+
+
+EXPORT_COLUMNS = {
+	'bookings': ['ts', 'slug', 'start', 'end', 'nights', 'total', 'status', 'name', 'email', 'phone', 'notes'],
+	'messages': ['ts', 'name', 'email', 'message'],
+	'visits': ['ts', 'ip', 'path', 'ua'],
+}
+
+
+class _EchoWriter:
+	# lets csv.writer hand back each formatted line instead of writing it somewhere
+	def write(self, value):
+		return value
+
+
+# spreadsheet apps run cells starting with these as formulas (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+	if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+		return "'" + value
+	return value
+
+
+@app.route('/api/admin/export')
+def admin_export():
+	# Streams ?kind=bookings|messages|visits as ?format=csv|ndjson, filtered by ?from=&to= on the
+	# timestamp (ISO date or datetime) and, for bookings, ?status=. Rows are generated one by one.
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	kind = request.args.get('kind') or 'bookings'
+	fmt = request.args.get('format') or 'csv'
+	if kind not in EXPORT_COLUMNS or fmt not in ('csv', 'ndjson'):
+		return jsonify({"error": "kind must be bookings, messages or visits and format csv or ndjson"}), 400
+	try:
+		start = time_bound(request.args.get('from')) or ''
+		end = time_bound(request.args.get('to'), upper=True) or ''
+	except ValueError as e:
+		return jsonify({"error": f"from and to: {e}"}), 400
+	status = request.args.get('status')
+
+	def rows():
+		if kind == 'visits':
+			yield from visit_log.query(start or None, end or None)
+			return
+		for msg in iter_messages():
+			is_booking = msg.get('type') == 'booking'
+			if is_booking != (kind == 'bookings'):
+				continue
+			ts = msg.get('ts') or ''
+			if (start and ts < start) or (end and ts > end):
+				continue
+			if is_booking:
+				msg['status'] = msg.get('status') or 'pending'
+			if status and msg.get('status') != status:
+				continue
+			yield msg
+
+	def generate():
+		if fmt == 'ndjson':
+			for row in rows():
+				yield json.dumps(row, ensure_ascii=False) + '\n'
+			return
+		columns = EXPORT_COLUMNS[kind]
+		writer = csv.writer(_EchoWriter())
+		yield writer.writerow(columns)
+		for row in rows():
+			yield writer.writerow([csv_cell(row.get(c, '')) for c in columns])
+
+	mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+	filename = f"{kind}-{datetime.utcnow().strftime('%Y%m%d')}.{fmt}"
+	return Response(stream_with_context(generate()), mimetype=mimetype, headers={ 'Content-Disposition': f'attachment; filename="{filename}"' })
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+@app.route('/api/admin/analytics')
+def admin_analytics():
+	# Occupancy, ADR and revenue per van and month for ?from=YYYY-MM-DD&to=YYYY-MM-DD
+	# (to exclusive, default: the last twelve months), from the iCal feeds and confirmed bookings
+	global _analytics
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	import analytics
+	try:
+		default_start, default_end = analytics.default_window()
+		start = as_date(request.args.get('from') or default_start)
+		end = as_date(request.args.get('to') or default_end)
+	except ValueError:
+		return jsonify({"error": "from and to must be YYYY-MM-DD"}), 400
+	if end <= start or (end - start).days > MAX_WINDOW_DAYS:
+		return jsonify({"error": f"to must be after from and at most {MAX_WINDOW_DAYS} days later"}), 400
+	try:
+		# Airbnb nights count as occupied, so a window past the feeds' dates would under-report
+		check_ical_window(start, end)
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
+	catalog = get_catalog()
+	busy, errors = fleet_busy_ranges(list(catalog)), {}
+	for slug, ranges in busy.items():
+		if isinstance(ranges, Exception):
+			# a feed being down shouldn't hide the direct bookings
+			busy[slug] = []
+			errors[slug] = str(ranges)
+	key = (catalog.version, file_version(STORE_PATH), start, end, tuple((slug, tuple(pairs)) for slug, pairs in busy.items()))
+	def compute():
+		bookings = [m for m in load_messages() if m.get('type') == 'booking' and m.get('status') == 'confirmed']
+		return analytics.build(catalog, busy, bookings, start, end)
+	with _analytics_lock:
+		if _analytics is None:
+			_analytics = analytics.FleetAnalytics()
+		result = _analytics.get(key, compute)
+	if errors:
+		result = dict(result, errors=errors)
+	return jsonify(result)
+
+
+GEO_TTL = 7 * 24 * 3600
+
+
+class GeoLookupError(Exception):
+	# non-200 answer from ipapi.co
+	def __init__(self, status_code, text):
+		super().__init__(f"ipapi.co returned {status_code}")
+		self.status_code = status_code
+		self.text = text
+
+
+def geo_lookup(ip):
+	# ipapi.co JSON for an IP; successful lookups are shared by all workers for GEO_TTL seconds
+	def fetch():
+		import requests
+		resp = requests.get(f"https://ipapi.co/{ip}/json/", timeout=3)
+		if not resp.ok:
+			raise GeoLookupError(resp.status_code, resp.text[:500])
+		return resp.json()
+	return shared_cache.get_or_set('geo:' + ip, fetch, GEO_TTL)
+
+
 @app.route('/api/track', methods=['POST'])
 def track():
-	stats = load_stats()
 	try:
 		p = request.get_json(force=True)
 		path = (p.get('path') or '/').split('?')[0]
 		ip = request.headers.get('X-Forwarded-For', '').split(',')[0].strip() or request.remote_addr or 'unknown'
 		ua = request.headers.get('User-Agent', '')
 		
-		# increment totals
-		stats['total'] = int(stats.get('total',0)) + 1
-		pages = stats.get('pages') or {}
-		pages[path] = int(pages.get(path,0)) + 1
-		stats['pages'] = pages
-		
 		# per-ip stats
-		ips = stats.get('ips') or {}
 		# attempt to resolve country for this IP (use a lightweight public API). Keep this optional/fail-safe.
+		# Done before stats.json is locked so a slow lookup doesn't hold up other workers.
 		country = 'Unknown'
+		geo_debug = None
 		try:
 			if ip and ip not in ('', 'unknown', '127.0.0.1', '::1'):
 				# ipapi.co returns JSON with country_name and country
-				resp = requests.get(f"https://ipapi.co/{ip}/json/", timeout=3)
-				if resp.ok:
-					j = resp.json()
-					# store the raw lookup in the running stats object so it isn't lost
-					try:
-						gd = stats.get('geo_debug') or {}
-						gd[ip] = { 'ok': True, 'data': j }
-						stats['geo_debug'] = gd
-					except Exception:
-						pass
-					country = j.get('country_name') or j.get('country') or 'Unknown'
-				else:
+				try:
+					j = geo_lookup(ip)
+				except GeoLookupError as resp:
 					# record non-200 response for debugging
-					try:
-						gd = stats.get('geo_debug') or {}
-						gd[ip] = { 'ok': False, 'status_code': resp.status_code, 'text': resp.text[:500] }
-						stats['geo_debug'] = gd
-					except Exception:
-						pass
+					geo_debug = { 'ok': False, 'status_code': resp.status_code, 'text': resp.text }
 					country = 'Unknown'
+				else:
+					# keep the raw lookup with the stats so it isn't lost
+					geo_debug = { 'ok': True, 'data': j }
+					country = j.get('country_name') or j.get('country') or 'Unknown'
 			else:
 				country = 'Local'
 		except Exception as exc:
 			# network or parse error — store exception for debugging and fallback to Unknown
-			try:
-				gd = stats.get('geo_debug') or {}
-				gd[ip] = { 'ok': False, 'error': str(exc) }
-				stats['geo_debug'] = gd
-			except Exception:
-				pass
+			geo_debug = { 'ok': False, 'error': str(exc) }
 			country = 'Unknown'
 		
-		info = ips.get(ip) or { 'count': 0, 'pages': {}, 'last': None, 'ua': ua }
-		info['count'] = int(info.get('count',0)) + 1
-		pp = info.get('pages') or {}
-		pp[path] = int(pp.get(path,0)) + 1
-		info['pages'] = pp
-		info['last'] = datetime.utcnow().isoformat() + 'Z'
-		info['ua'] = ua or info.get('ua','')
-		# Ensure country is stored/updated for this IP (force set so it's included in saved stats)
-		info['country'] = country
-		ips[ip] = info
-		stats['ips'] = ips
-		
-		# aggregate visits by country (counts visits, not unique IPs)
-		by_country = stats.get('by_country_visits') or {}
-		ct = country or info.get('country') or 'Unknown'
-		by_country[ct] = int(by_country.get(ct, 0)) + 1
-		stats['by_country_visits'] = by_country
+		with locked(STATS_PATH):
+			stats = load_stats()
+			
+			# increment totals
+			stats['total'] = int(stats.get('total',0)) + 1
+			pages = stats.get('pages') or {}
+			pages[path] = int(pages.get(path,0)) + 1
+			stats['pages'] = pages
+			
+			if geo_debug is not None:
+				gd = stats.get('geo_debug') or {}
+				gd[ip] = geo_debug
+				stats['geo_debug'] = gd
+			
+			record_ip_visit(stats, ip, path, ua, country)
+			
+			# aggregate visits by country (counts visits, not unique IPs)
+			by_country = stats.get('by_country_visits') or {}
+			by_country[country] = int(by_country.get(country, 0)) + 1
+			stats['by_country_visits'] = by_country
+			
+			save_stats(stats)
 		
-		# append to rolling log
-		log = stats.get('log') or []
-		log.append({ 'ts': datetime.utcnow().isoformat() + 'Z', 'ip': ip, 'path': path, 'ua': ua })
-		# keep only last 500
-		stats['log'] = log[-500:]
+		# raw event goes to the visit archive, not stats.json
+		visit_log.append({ 'ts': datetime.utcnow().isoformat() + 'Z', 'ip': ip, 'path': path, 'ua': ua })
 		
-		save_stats(stats)
+		publish_stats(stats)
 		return jsonify({'ok': True})
 	except Exception as e:
 		print(f"Track error: {e}")
@@ -363,65 +924,256 @@ def track():
 
 @app.route('/api/stats')
 def stats():
+	# Default is a compact summary: headline numbers plus the top pages and countries.
+	# ?view=full returns the whole stats blob; per-IP detail lives at /api/stats/ips.
 	if not is_admin(request):
 		return jsonify({"error":"unauthorized"}), 401
 	stats_data = load_stats()
-	# Ensure we have some default data if empty
-	if not stats_data.get('total'):
-		stats_data['total'] = 0
-	if not stats_data.get('pages'):
-		stats_data['pages'] = {}
-	if not stats_data.get('ips'):
-		stats_data['ips'] = {}
-	if not stats_data.get('log'):
-		stats_data['log'] = []
-	if not stats_data.get('confirmed_revenue'):
-		stats_data['confirmed_revenue'] = 0
-	
-	# Calculate unique visitors (unique IPs)
-	unique_ips = len(stats_data.get('ips', {}))
-	stats_data['unique_visitors'] = unique_ips
+	if request.args.get('view') == 'full':
+		stats_data.setdefault('confirmed_revenue', 0)
+		return jsonify(stats_data)
+	try:
+		top = max(1, int(request.args.get('top') or 10))
+	except ValueError:
+		return jsonify({"error": "top must be an integer"}), 400
+	return jsonify(stats_summary(stats_data, top))
+
 
-	# Aggregate by country: total visits and unique IPs per country
+def stats_summary(stats_data, top=10):
+	# Also the payload of 'stats' change events
 	by_country_visits = stats_data.get('by_country_visits') or {}
-	# compute unique IPs per country from stats_data['ips']
-	by_country_unique = {}
-	for ip, info in (stats_data.get('ips') or {}).items():
-		c = info.get('country') or 'Unknown'
-		by_country_unique[c] = int(by_country_unique.get(c, 0)) + 1
-
-	stats_data['by_country_visits'] = by_country_visits
-	stats_data['by_country_unique'] = by_country_unique
-	
-	return jsonify(stats_data)
+	sketches = stats_data.get('hll') or {}
+	country_sketches = sketches.get('countries') or {}
+	top_pages = heapq.nlargest(top, (stats_data.get('pages') or {}).items(), key=lambda kv: kv[1])
+	top_countries = heapq.nlargest(top, by_country_visits.items(), key=lambda kv: kv[1])
+	return {
+		'total': int(stats_data.get('total') or 0),
+		'unique_visitors': HyperLogLog.loads(sketches.get('all')).count(),
+		'confirmed_revenue': stats_data.get('confirmed_revenue') or 0,
+		'pages': dict(top_pages),
+		'by_country_visits': dict(top_countries),
+		'by_country_unique': { c: HyperLogLog.loads(country_sketches.get(c)).count() for c, _ in top_countries },
+		'page_count': len(stats_data.get('pages') or {}),
+		'country_count': len(by_country_visits),
+	}
+
+
+@app.route('/api/stats/unique')
+def stats_unique():
+	# Unique visitors overall, per country and per page for ?from=YYYY-MM-DD&to=YYYY-MM-DD,
+	# estimated by merging the per-day HyperLogLog sketches in the range. Days older than
+	# UNIQUE_DAYS_KEEP only exist as monthly sketches; any month overlapping the range is
+	# included whole and listed under 'months'.
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	start = request.args.get('from') or ''
+	end = request.args.get('to') or '9999-12-31'
+	sketches = load_stats().get('hll') or {}
+	days = sketches.get('days') or {}
+	months = sketches.get('months') or {}
+	selected = [d for day, d in days.items() if start <= day <= end]
+	whole_months = sorted(m for m in months if start[:7] <= m <= end[:7])
+	selected += [months[m] for m in whole_months]
+	combined = { 'all': merged(d.get('all') for d in selected).dumps(), 'countries': {}, 'pages': {} }
+	for group in ('countries', 'pages'):
+		keys = set(k for d in selected for k in (d.get(group) or {}))
+		for key in keys:
+			combined[group][key] = merged((d.get(group) or {}).get(key) for d in selected).dumps()
+	out = unique_counts(combined)
+	out.update({ 'from': start or None, 'to': request.args.get('to'), 'days': len(selected) - len(whole_months), 'months': whole_months })
+	return jsonify(out)
+
+
+@app.route('/api/stats/ips')
+def stats_ips():
+	# Paginated per-IP detail, most active first (?sort=last for most recent first)
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	try:
+		page = max(1, int(request.args.get('page') or 1))
+		per_page = min(200, max(1, int(request.args.get('per_page') or 20)))
+	except ValueError:
+		return jsonify({"error": "page and per_page must be integers"}), 400
+	ips = load_stats().get('ips') or {}
+	if request.args.get('sort') == 'last':
+		key = lambda kv: kv[1].get('last') or ''
+	else:
+		key = lambda kv: int(kv[1].get('count') or 0)
+	# only the entries up to the requested page need ordering
+	ranked = heapq.nlargest(page * per_page, ips.items(), key=key)
+	items = [dict(info, ip=ip) for ip, info in ranked[(page - 1) * per_page:]]
+	return jsonify({ 'page': page, 'per_page': per_page, 'total': len(ips), 'items': items })
+
+
+@app.route('/api/visits')
+def visits():
+	# Streams raw visit events as NDJSON; ?from= and ?to= take ISO dates or timestamps
+	if not is_admin(request):
+		return jsonify({"error":"unauthorized"}), 401
+	start = request.args.get('from')
+	end = request.args.get('to')
+	newest_first = request.args.get('order') == 'desc'
+	try:
+		time_bound(start)
+		time_bound(end)
+	except ValueError as e:
+		return jsonify({"error": f"from and to: {e}"}), 400
+	try:
+		offset = max(0, int(request.args.get('offset') or 0))
+		limit = max(0, int(request.args.get('limit') or 0))
+	except ValueError:
+		return jsonify({"error": "offset and limit must be integers"}), 400
+	events = visit_log.query(start, end, reverse=newest_first)
+	events = itertools.islice(events, offset, offset + limit if limit else None)
+
+	def generate():
+		for ev in events:
+			yield json.dumps(ev, ensure_ascii=False) + '\n'
+
+	resp = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+	if not (start or end):
+		resp.headers['X-Total-Count'] = str(visit_log.count())
+	return resp
+
 
 @app.route('/api/test-stats', methods=['POST'])
 def test_stats():
 	if not is_admin(request):
 		return jsonify({"error":"unauthorized"}), 401
 	# Generate some test statistics
-	stats = load_stats()
-	stats['total'] = stats.get('total', 0) + 1
-	stats['pages'] = stats.get('pages', {})
-	stats['pages']['/'] = stats['pages'].get('/', 0) + 1
-	stats['pages']['/vans'] = stats['pages'].get('/vans', 0) + 1
-	stats['ips'] = stats.get('ips', {})
-	stats['ips']['127.0.0.1'] = {
-		'count': stats['ips'].get('127.0.0.1', {}).get('count', 0) + 1,
-		'pages': {'/': 1, '/vans': 1},
-		'last': datetime.utcnow().isoformat() + 'Z',
-		'ua': 'Test Browser'
-	}
-	stats['log'] = stats.get('log', [])
-	stats['log'].append({
+	with locked(STATS_PATH):
+		stats = load_stats()
+		stats['total'] = stats.get('total', 0) + 1
+		stats['pages'] = stats.get('pages', {})
+		stats['pages']['/'] = stats['pages'].get('/', 0) + 1
+		stats['pages']['/vans'] = stats['pages'].get('/vans', 0) + 1
+		record_ip_visit(stats, '127.0.0.1', '/', 'Test Browser', 'Local')
+		save_stats(stats)
+	visit_log.append({
 		'ts': datetime.utcnow().isoformat() + 'Z',
 		'ip': '127.0.0.1',
 		'path': '/',
 		'ua': 'Test Browser'
 	})
-	save_stats(stats)
+	publish_stats(stats)
 	return jsonify({'ok': True, 'message': 'Test stats added'})
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff', '.avif', '.heic', '.svg'}
+
+
+def sniff_image(head):
+	# Image extension from the first bytes of a file, or None if it is not a supported image
+	if head.startswith(b'\xff\xd8\xff'):
+		return '.jpg'
+	if head.startswith(b'\x89PNG\r\n\x1a\n'):
+		return '.png'
+	if head[:6] in (b'GIF87a', b'GIF89a'):
+		return '.gif'
+	if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+		return '.webp'
+	if head[:4] in (b'II*\x00', b'MM\x00*'):
+		return '.tiff'
+	if head[:2] == b'BM':
+		return '.bmp'
+	if head[4:8] == b'ftyp':
+		brand = head[8:12]
+		if brand in (b'avif', b'avis'):
+			return '.avif'
+		if brand in (b'heic', b'heix', b'mif1', b'msf1', b'hevc'):
+			return '.heic'
+	return None
+
+
+class UploadStream:
+	# Where the form parser writes an uploaded file: straight into a temp file in UPLOADS_TMP_DIR,
+	# hashing as it goes and keeping the first bytes for sniffing.
+	# Parsing stops with 413 as soon as the file passes MAX_UPLOAD_FILE_BYTES.
+	HEAD_BYTES = 32
+
+	def __init__(self, limit):
+		os.makedirs(UPLOADS_TMP_DIR, exist_ok=True)
+		fd, self.path = tempfile.mkstemp(dir=UPLOADS_TMP_DIR, suffix='.part')
+		self._file = os.fdopen(fd, 'w+b')
+		self.limit = limit
+		self.size = 0
+		self.head = b''
+		self.digest = hashlib.sha256()
+		self.claimed = False
+
+	def write(self, data):
+		self.size += len(data)
+		if self.limit and self.size > self.limit:
+			raise RequestEntityTooLarge(f"File is larger than {self.limit} bytes")
+		if len(self.head) < self.HEAD_BYTES:
+			self.head += data[:self.HEAD_BYTES - len(self.head)]
+		self.digest.update(data)
+		return self._file.write(data)
+
+	def read(self, *args):
+		return self._file.read(*args)
+
+	def readline(self, *args):
+		return self._file.readline(*args)
+
+	def seek(self, *args):
+		return self._file.seek(*args)
+
+	def tell(self):
+		return self._file.tell()
+
+	def flush(self):
+		return self._file.flush()
+
+	def claim(self, filepath):
+		# Moves the finished upload into place (or drops it if that content is already stored)
+		self._file.close()
+		if os.path.exists(filepath):
+			os.remove(self.path)
+		else:
+			os.replace(self.path, filepath)
+		self.claimed = True
+
+	def close(self):
+		self._file.close()
+		if not self.claimed and os.path.exists(self.path):
+			os.remove(self.path)
+
+
+class SiteRequest(Request):
+	def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+		stream = UploadStream(current_app.config['MAX_UPLOAD_FILE_BYTES'])
+		# remembered so a part abandoned mid-parse (e.g. over the limit) is still cleaned up
+		self.__dict__.setdefault('upload_streams', []).append(stream)
+		return stream
+
+	def close(self):
+		super().close()
+		for stream in self.__dict__.get('upload_streams', ()):
+			stream.close()
+
+
+app.request_class = SiteRequest
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+	return jsonify({"error": e.description or "Upload too large"}), 413
+
+
+def store_image(file):
+	# Stores an upload under its content hash, so the same photo uploaded twice is one file
+	# and its URL never changes content (safe to cache forever). Returns (url, filename).
+	stream = file.stream
+	ext = sniff_image(stream.head)
+	if not ext:
+		raise ValueError("Unsupported image type")
+	name = stream.digest.hexdigest()[:32] + ext
+	subdir = os.path.join(UPLOADS_DIR, name[:2])
+	os.makedirs(subdir, exist_ok=True)
+	stream.claim(os.path.join(subdir, name))
+	return f"/static/images/uploads/{name[:2]}/{name}", name
+
+
 @app.route('/api/admin/upload-image', methods=['POST'])
 def upload_image():
 	if not is_admin(request):
@@ -439,20 +1191,11 @@ def upload_image():
 	if not van_slug:
 		return jsonify({"error": "Van slug required"}), 400
 	
-	# Create van-specific directory
-	van_dir = os.path.join('static', 'images', van_slug)
-	os.makedirs(van_dir, exist_ok=True)
-	
-	# Generate unique filename
-	import uuid
-	filename = f"{uuid.uuid4().hex[:8]}_{file.filename}"
-	filepath = os.path.join(van_dir, filename)
-	
 	try:
-		file.save(filepath)
-		# Return the URL path
-		url_path = f"/static/images/{van_slug}/{filename}"
+		url_path, filename = store_image(file)
 		return jsonify({"ok": True, "url": url_path, "filename": filename})
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
 
@@ -468,58 +1211,25 @@ def upload_about_image():
 	if file.filename == '':
 		return jsonify({"error": "No file selected"}), 400
 
-	from werkzeug.utils import secure_filename
-	import imghdr
-	import uuid
-
-	about_dir = os.path.join(os.path.dirname(__file__), 'static', 'images', 'about')
-	os.makedirs(about_dir, exist_ok=True)
-
-	raw_name = secure_filename(file.filename or '')
-	# Read file bytes to detect type then rewind the stream
-	content = file.read()
-	try:
-		file.stream.seek(0)
-	except Exception:
-		pass
-
-	detected = imghdr.what(None, h=content)
-
-	# Build filename with detected extension if necessary
-	if raw_name:
-		name, ext = os.path.splitext(raw_name)
-		if ext:
-			filename = f"{uuid.uuid4().hex[:8]}_{name}{ext}"
-		else:
-			if detected:
-				filename = f"{uuid.uuid4().hex[:8]}_{name}.{detected}"
-			else:
-				filename = f"{uuid.uuid4().hex[:8]}_{name}.png"
-	else:
-		if detected:
-			filename = f"{uuid.uuid4().hex[:8]}.{detected}"
-		else:
-			filename = f"{uuid.uuid4().hex[:8]}.png"
-
-	filepath = os.path.join(about_dir, filename)
-
 	try:
-		file.save(filepath)
-		url_path = f"/static/images/about/{filename}"
+		url_path, filename = store_image(file)
 
 		# Persist to config
-		config = load_config()
-		sc = config.setdefault('site_content', {})
-		about = sc.setdefault('about', {})
-		photos = about.get('photos') or []
-		# store photos as objects {url, size}
-		entry = { 'url': url_path, 'size': '360px' }
-		photos.append(entry)
-		about['photos'] = photos
-		sc['about'] = about
-		config['site_content'] = sc
-		save_config(config)
+		with locked(CONFIG_PATH):
+			config = load_config()
+			sc = config.setdefault('site_content', {})
+			about = sc.setdefault('about', {})
+			photos = about.get('photos') or []
+			# store photos as objects {url, size}; re-uploading the same photo does not add it twice
+			if not any((p.get('url') if isinstance(p, dict) else p) == url_path for p in photos):
+				photos.append({ 'url': url_path, 'size': '360px' })
+			about['photos'] = photos
+			sc['about'] = about
+			config['site_content'] = sc
+			save_config(config)
 		return jsonify({"ok": True, "url": url_path, "filename": filename, "size": "360px"})
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
 	except Exception as e:
 		return jsonify({"error": "Failed to save file: " + str(e)}), 500
 
@@ -543,24 +1253,18 @@ def remove_about_image():
 		if not image_url:
 			return jsonify({"error": "Image URL required"}), 400
 
-		filename = image_url.split('/')[-1]
-		filepath = os.path.join(os.path.dirname(__file__), 'static', 'images', 'about', filename)
-		if os.path.exists(filepath):
-			try:
-				os.remove(filepath)
-			except Exception:
-				pass
-
+		# the file itself may be shared with other photos; `flask gc-images` reclaims it once unreferenced
 		# remove from config (photos are objects)
-		config = load_config()
-		sc = config.get('site_content', {})
-		about = sc.get('about', {})
-		photos = about.get('photos', []) or []
-		new_photos = [p for p in photos if not ((isinstance(p, dict) and p.get('url') == image_url) or (isinstance(p, str) and p == image_url))]
-		about['photos'] = new_photos
-		sc['about'] = about
-		config['site_content'] = sc
-		save_config(config)
+		with locked(CONFIG_PATH):
+			config = load_config()
+			sc = config.get('site_content', {})
+			about = sc.get('about', {})
+			photos = about.get('photos', []) or []
+			new_photos = [p for p in photos if not ((isinstance(p, dict) and p.get('url') == image_url) or (isinstance(p, str) and p == image_url))]
+			about['photos'] = new_photos
+			sc['about'] = about
+			config['site_content'] = sc
+			save_config(config)
 		return jsonify({"ok": True, "message": "About image removed"})
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
@@ -578,18 +1282,14 @@ def remove_image():
 		if not van_slug or not image_url:
 			return jsonify({"error": "Van slug and image URL required"}), 400
 		
-		# Extract filename from URL
-		filename = image_url.split('/')[-1]
-		filepath = os.path.join('static', 'images', van_slug, filename)
-		
-		# Remove file if it exists
-		if os.path.exists(filepath):
-			os.remove(filepath)
-		
+		# The file may be shared with other vans; `flask gc-images` reclaims it once unreferenced
 		# Update van photos in config and primary image if needed
-		config = load_config()
-		for van in config.get('vans', []):
-			if van.get('slug') == van_slug:
+		with locked(CONFIG_PATH):
+			config = load_config()
+			vans = config.get('vans', [])
+			i = van_position(vans, van_slug)
+			if i is not None:
+				van = vans[i]
 				photos = van.get('photos', []) or []
 				if image_url in photos:
 					photos.remove(image_url)
@@ -598,9 +1298,8 @@ def remove_image():
 				main = van.get('imageUrl') or ''
 				if (main == image_url) or (main and main not in photos):
 					van['imageUrl'] = photos[0] if photos else ''
-				break
 		
-		save_config(config)
+			save_config(config)
 		return jsonify({"ok": True, "message": "Image removed successfully"})
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
@@ -618,24 +1317,19 @@ def update_van():
 		if not van_slug:
 			return jsonify({"error": "Van slug required"}), 400
 		
-		config = load_config()
-		vans = config.get('vans', [])
-		
-		# Find and update the van
-		van_found = False
-		for i, van in enumerate(vans):
-			if van.get('slug') == van_slug:
-				# Update the van with new data
-				vans[i].update(updates)
-				van_found = True
-				break
+		with locked(CONFIG_PATH):
+			config = load_config()
+			vans = config.get('vans', [])
 		
-		if not van_found:
-			return jsonify({"error": "Van not found"}), 404
+			# Find and update the van
+			i = van_position(vans, van_slug)
+			if i is None:
+				return jsonify({"error": "Van not found"}), 404
+			vans[i].update(updates)
 		
-		# Save updated config
-		config['vans'] = vans
-		save_config(config)
+			# Save updated config
+			config['vans'] = vans
+			save_config(config)
 		
 		return jsonify({"ok": True, "message": "Van updated successfully"})
 	except Exception as e:
@@ -655,34 +1349,34 @@ def create_van():
 			return jsonify({"error": "Slug and name are required"}), 400
 		
 		# Validate slug format (lowercase, hyphens only)
-		import re
 		if not re.match(r'^[a-z0-9-]+$', slug):
 			return jsonify({"error": "Slug must contain only lowercase letters, numbers, and hyphens"}), 400
 		
-		config = load_config()
-		vans = config.get('vans', [])
-		
-		# Check if slug already exists
-		if any(v.get('slug') == slug for v in vans):
-			return jsonify({"error": "A van with this slug already exists"}), 400
-		
-		# Create new van with default values
-		new_van = {
-			'slug': slug,
-			'name': name,
-			'pricePerNight': data.get('pricePerNight', 0),
-			'description': data.get('description', ''),
-			'imageUrl': data.get('imageUrl', ''),
-			'photos': data.get('photos', []),
-			'equipment': data.get('equipment', []),
-			'airbnbIcalUrl': data.get('airbnbIcalUrl', ''),
-			'airbnbUrl': data.get('airbnbUrl', '')
-		}
-		
-		# Add the new van
-		vans.append(new_van)
-		config['vans'] = vans
-		save_config(config)
+		with locked(CONFIG_PATH):
+			config = load_config()
+			vans = config.get('vans', [])
+		
+			# Check if slug already exists
+			if get_catalog().get(slug):
+				return jsonify({"error": "A van with this slug already exists"}), 400
+		
+			# Create new van with default values
+			new_van = {
+				'slug': slug,
+				'name': name,
+				'pricePerNight': data.get('pricePerNight', 0),
+				'description': data.get('description', ''),
+				'imageUrl': data.get('imageUrl', ''),
+				'photos': data.get('photos', []),
+				'equipment': data.get('equipment', []),
+				'airbnbIcalUrl': data.get('airbnbIcalUrl', ''),
+				'airbnbUrl': data.get('airbnbUrl', '')
+			}
+		
+			# Add the new van
+			vans.append(new_van)
+			config['vans'] = vans
+			save_config(config)
 		
 		# Create directory for van images
 		van_dir = os.path.join('static', 'images', slug)
@@ -704,23 +1398,19 @@ def delete_van():
 		if not van_slug:
 			return jsonify({"error": "Van slug required"}), 400
 		
-		config = load_config()
-		vans = config.get('vans', [])
-		
-		# Find and remove the van
-		van_found = False
-		for i, van in enumerate(vans):
-			if van.get('slug') == van_slug:
-				vans.pop(i)
-				van_found = True
-				break
+		with locked(CONFIG_PATH):
+			config = load_config()
+			vans = config.get('vans', [])
 		
-		if not van_found:
-			return jsonify({"error": "Van not found"}), 404
+			# Find and remove the van
+			i = van_position(vans, van_slug)
+			if i is None:
+				return jsonify({"error": "Van not found"}), 404
+			vans.pop(i)
 		
-		# Save updated config
-		config['vans'] = vans
-		save_config(config)
+			# Save updated config
+			config['vans'] = vans
+			save_config(config)
 		
 		return jsonify({"ok": True, "message": "Van deleted successfully"})
 	except Exception as e:
@@ -738,37 +1428,41 @@ def confirm_booking():
 		if not booking_id:
 			return jsonify({"error": "Booking ID required"}), 400
 		
-		# Load messages and find the booking
-		messages = load_messages()
-		booking_found = False
-		booking_total = 0
-		
-		for i, msg in enumerate(messages):
-			if msg.get('type') == 'booking' and msg.get('ts') == booking_id:
-				current_status = msg.get('status', 'pending')
-				if current_status == 'pending':
-					messages[i]['status'] = 'confirmed'
-					booking_total = msg.get('total', 0)
-					booking_found = True
-					break
-				elif current_status == 'confirmed':
-					return jsonify({"error": "Booking already confirmed"}), 400
-				else:
-					return jsonify({"error": "Booking is cancelled"}), 400
-		
-		if not booking_found:
-			return jsonify({"error": "Booking not found"}), 404
-		
-		# Get booking details for email
-		booking = next((msg for msg in messages if msg.get('type') == 'booking' and msg.get('ts') == booking_id), None)
-		
-		# Save updated messages
-		save_messages(messages)
+		with locked(STORE_PATH):
+			# Load messages and find the booking
+			messages = load_messages()
+			booking_found = False
+			booking_total = 0
+		
+			for i, msg in enumerate(messages):
+				if msg.get('type') == 'booking' and msg.get('ts') == booking_id:
+					current_status = msg.get('status', 'pending')
+					if current_status == 'pending':
+						messages[i]['status'] = 'confirmed'
+						booking_total = msg.get('total', 0)
+						booking_found = True
+						break
+					elif current_status == 'confirmed':
+						return jsonify({"error": "Booking already confirmed"}), 400
+					else:
+						return jsonify({"error": "Booking is cancelled"}), 400
+		
+			if not booking_found:
+				return jsonify({"error": "Booking not found"}), 404
+		
+			# Get booking details for email
+			booking = next((msg for msg in messages if msg.get('type') == 'booking' and msg.get('ts') == booking_id), None)
+		
+			# Save updated messages
+			save_messages(messages)
+		publish_change('status', { 'id': i, 'ts': booking_id, 'status': 'confirmed' })
 		
 		# Update stats with confirmed revenue
-		stats = load_stats()
-		stats['confirmed_revenue'] = stats.get('confirmed_revenue', 0) + booking_total
-		save_stats(stats)
+		with locked(STATS_PATH):
+			stats = load_stats()
+			stats['confirmed_revenue'] = stats.get('confirmed_revenue', 0) + booking_total
+			save_stats(stats)
+		publish_stats(stats, force=True)
 		
 		# Send confirmation email to customer
 		if booking and booking.get('email'):
@@ -776,15 +1470,8 @@ def confirm_booking():
 			van_name = booking.get('slug', '').replace('-', ' ').title()
 			
 			# Find van's Airbnb link
-			config = load_config()
-			van = next((v for v in config.get('vans', []) if v.get('slug') == booking.get('slug')), None)
-			airbnb_url = ''
-			if van:
-				ical = van.get('airbnbIcalUrl') or ''
-				import re
-				m = re.search(r"/ical/(\d+)", ical)
-				if m:
-					airbnb_url = f"https://www.airbnb.com/rooms/{m.group(1)}"
+			van = get_catalog().get(booking.get('slug'))
+			airbnb_url = (van.airbnbUrl if van else '') or ''
 			
 			# Prepare customer confirmation email
 			confirmation_body = f"""Great news! Your booking has been confirmed!
@@ -863,67 +1550,209 @@ def undo_booking():
 		if not booking_id:
 			return jsonify({"error": "Booking ID required"}), 400
 		
-		# Load messages and find the booking
-		messages = load_messages()
-		booking_found = False
-		booking_total = 0
-		
-		for i, msg in enumerate(messages):
-			if msg.get('type') == 'booking' and msg.get('ts') == booking_id:
-				current_status = msg.get('status', 'pending')
-				if current_status == 'confirmed':
-					messages[i]['status'] = 'pending'
-					booking_total = msg.get('total', 0)
-					booking_found = True
-					break
-				else:
-					return jsonify({"error": "Booking is not confirmed"}), 400
-		
-		if not booking_found:
-			return jsonify({"error": "Booking not found"}), 404
-		
-		# Save updated messages
-		save_messages(messages)
+		with locked(STORE_PATH):
+			# Load messages and find the booking
+			messages = load_messages()
+			booking_found = False
+			booking_total = 0
+		
+			for i, msg in enumerate(messages):
+				if msg.get('type') == 'booking' and msg.get('ts') == booking_id:
+					current_status = msg.get('status', 'pending')
+					if current_status == 'confirmed':
+						messages[i]['status'] = 'pending'
+						booking_total = msg.get('total', 0)
+						booking_found = True
+						break
+					else:
+						return jsonify({"error": "Booking is not confirmed"}), 400
+		
+			if not booking_found:
+				return jsonify({"error": "Booking not found"}), 404
+		
+			# Save updated messages
+			save_messages(messages)
+		publish_change('status', { 'id': i, 'ts': booking_id, 'status': 'pending' })
 		
 		# Update stats by removing confirmed revenue
-		stats = load_stats()
-		stats['confirmed_revenue'] = max(0, stats.get('confirmed_revenue', 0) - booking_total)
-		save_stats(stats)
+		with locked(STATS_PATH):
+			stats = load_stats()
+			stats['confirmed_revenue'] = max(0, stats.get('confirmed_revenue', 0) - booking_total)
+			save_stats(stats)
+		publish_stats(stats, force=True)
 		
 		return jsonify({"ok": True, "message": "Booking undone successfully", "total": booking_total})
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
 
 
+# Parsed iCal busy ranges live in the shared cache under 'ical:<feed url>' as merged
+# [startISO, endISO] pairs for ICAL_TTL seconds, within the ical_horizon() window
+ICAL_TTL = 300
+ICAL_HISTORY_DAYS = 400
+ICAL_FUTURE_DAYS = 3 * 366
+
+
+def van_busy_ranges(van):
+	# Merged busy (start, end) date ranges from the van's Airbnb iCal feed, cached for ICAL_TTL seconds
+	ical_url = van.airbnbIcalUrl
+	if not ical_url:
+		return []
+	cached = shared_cache.get_or_set('ical:' + ical_url, lambda: fetch_busy_ranges(ical_url), ICAL_TTL)
+	return [(as_date(start), as_date(end)) for start, end in cached]
+
+
+def ical_horizon(today=None):
+	# Events ending more than ICAL_HISTORY_DAYS ago or starting more than ICAL_FUTURE_DAYS ahead are never shown
+	today = today or datetime.utcnow().date()
+	return today - timedelta(days=ICAL_HISTORY_DAYS), today + timedelta(days=ICAL_FUTURE_DAYS)
+
+
+def check_ical_window(start, end):
+	# Days outside ical_horizon() were never read from the feeds and would look free
+	first, last = ical_horizon()
+	if start < first or end > last:
+		raise ValueError(f"from and to must be within {first.isoformat()} and {last.isoformat()}, the dates iCal feeds are read for")
+
+
+def ical_window(start_text, end_text):
+	# parse_window() for routes that answer from the iCal feeds
+	start, end = parse_window(start_text, end_text)
+	check_ical_window(start, end)
+	return start, end
+
+
+def fetch_busy_ranges(ical_url):
+	# Downloads and parses a feed into merged [start, end] ISO date pairs (plain JSON for the shared cache).
+	# The feed is parsed as it streams in; anything the streaming parser can't read goes through icalendar.
+	import requests
+	start, end = ical_horizon()
+	with requests.get(ical_url, timeout=15, stream=True) as resp:
+		resp.raise_for_status()
+		try:
+			busy = list(icalstream.busy_ranges(resp.iter_lines(), start, end))
+		except icalstream.Unsupported:
+			busy = None
+	if busy is None:
+		# rare enough that fetching again beats holding every feed's full text in memory
+		resp = requests.get(ical_url, timeout=15)
+		resp.raise_for_status()
+		busy = list(icalstream.parse_calendar(resp.text, start, end))
+	return [[s.isoformat(), e.isoformat()] for s, e in merge_ranges(busy)]
+
+
+ICAL_FETCH_WORKERS = 8
+
+
+def fleet_busy_ranges(vans):
+	# {slug: busy ranges, or the exception the fetch raised} for several vans.
+	# Cached feeds are read directly; the rest are fetched concurrently.
+	out, missing = {}, []
+	for van in vans:
+		if van.airbnbIcalUrl and shared_cache.get('ical:' + van.airbnbIcalUrl) is None:
+			missing.append(van)
+			continue
+		try:
+			out[van.slug] = van_busy_ranges(van)
+		except Exception as e:
+			out[van.slug] = e
+	if missing:
+		from concurrent.futures import ThreadPoolExecutor
+		with ThreadPoolExecutor(max_workers=min(ICAL_FETCH_WORKERS, len(missing))) as pool:
+			futures = { van.slug: pool.submit(van_busy_ranges, van) for van in missing }
+		for slug, future in futures.items():
+			out[slug] = future.exception() or future.result()
+	return out
+
+
+def availability_payload(van, window, fmt=None):
+	# Busy days of a van clipped to the (from, to) window; fmt='bitmap' returns
+	# one '0'/'1' character per day instead of ranges
+	out = { "slug": van.slug }
+	out.update(window_payload(van_busy_ranges(van), window[0], window[1], fmt))
+	return out
+
+
+@warmup_hook
+def warm_catalog():
+	get_catalog()
+
+
+@warmup_hook
+def warm_stats():
+	# also moves any legacy log out of stats.json before workers start
+	with locked(STATS_PATH):
+		load_stats()
+
+
+@warmup_hook
+def warm_availability():
+	for slug, busy in fleet_busy_ranges(list(get_catalog())).items():
+		if isinstance(busy, Exception):
+			print(f"Warm-up availability {slug} failed: {busy}")
+
+
 @app.route("/api/availability")
 def availability():
+	# ?slug=van-1 for one van; ?slugs=van-1,van-2 or ?fleet=1 for several in one response
+	if request.args.get("slugs") is not None or wants_fleet():
+		return availability_batch()
 	slug = request.args.get("slug")
 	if not slug:
 		return jsonify({"error": "missing slug"}), 400
-	config = load_config()
-	van = next((v for v in config.get("vans", []) if v.get("slug") == slug), None)
+	van = get_catalog().get(slug)
 	if not van:
 		return jsonify({"error": "unknown van" }), 404
-	ical_url = van.get("airbnbIcalUrl")
-	if not ical_url:
-		return jsonify({"busy": []})
 	try:
-		resp = requests.get(ical_url, timeout=15)
-		resp.raise_for_status()
-		cal = Calendar.from_ical(resp.text)
-		busy = []
-		for component in cal.walk():
-			if component.name == "VEVENT":
-				start = component.get("dtstart").dt
-				end = component.get("dtend").dt
-				if isinstance(start, datetime):
-					start = start.astimezone(tz.UTC)
-				if isinstance(end, datetime):
-					end = end.astimezone(tz.UTC)
-				busy.append({ "start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d") })
+		window = ical_window(request.args.get('from'), request.args.get('to'))
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
+	try:
+		return jsonify(availability_payload(van, window, request.args.get('format')))
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
-	return jsonify({"slug": slug, "busy": busy})
+
+
+def wants_fleet():
+	# only ?fleet=1 or ?fleet=true ask for every van; fleet=0, fleet=false etc. don't
+	return (request.args.get("fleet") or '').strip().lower() in ('1', 'true')
+
+
+def availability_batch():
+	# Every requested van's availability for one window, in catalog order; feeds that
+	# aren't cached yet are fetched concurrently. A van whose feed fails gets an error entry.
+	catalog = get_catalog()
+	if wants_fleet():
+		vans = list(catalog)
+		unknown = []
+	else:
+		slugs = [s for s in dict.fromkeys((request.args.get("slugs") or '').split(',')) if s]
+		if not slugs:
+			return jsonify({"error": "missing slugs"}), 400
+		vans = [catalog.get(s) for s in slugs if catalog.get(s)]
+		unknown = [s for s in slugs if not catalog.get(s)]
+	try:
+		start, end = ical_window(request.args.get('from'), request.args.get('to'))
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 400
+	fmt = request.args.get('format')
+	busy_by_slug = fleet_busy_ranges(vans)
+	out = []
+	failed = False
+	for van in vans:
+		busy = busy_by_slug[van.slug]
+		if isinstance(busy, Exception):
+			out.append({ "slug": van.slug, "error": str(busy) })
+			failed = True
+		else:
+			entry = { "slug": van.slug }
+			entry.update(window_payload(busy, start, end, fmt))
+			out.append(entry)
+	out.extend({ "slug": s, "error": "unknown van" } for s in unknown)
+	resp = jsonify({ "from": start.isoformat(), "to": end.isoformat(), "vans": out })
+	if not failed:
+		resp.headers['Cache-Control'] = 'public, max-age=60'
+	return resp
 
 
 @app.route('/api/contact', methods=['POST'])
@@ -968,9 +1797,8 @@ def book_request():
 			except EmailNotValidError:
 				return jsonify({"ok": False, "error": "Invalid email address"}), 400
 		
-		vans = load_config().get("vans", [])
-		van = next((v for v in vans if v.get('slug') == slug), None)
-		van_name = van.get('name') if van else slug
+		van = get_catalog().get(slug)
+		van_name = van.name if van else slug
 		
 		entry = { 
 			'type': 'booking', 
@@ -1035,27 +1863,95 @@ MyCamperVans Team"""
 		
 		customer_sent = send_email("Your Booking Request - MyCamperVans", customer_body, None, to_email=customer_email)
 		
-		return jsonify({"ok": True, "sent": admin_sent and customer_sent})
+		# the booking's ts identifies it, e.g. as "booking" for /api/checkout
+		return jsonify({"ok": True, "sent": admin_sent and customer_sent, "booking": entry['ts']})
 	except Exception as e:
 		return jsonify({"ok": False, "error": str(e)}), 500
 
 
+# Stripe is configured once per process; checkout sessions are cached per idempotency key in the shared cache
+_stripe_settings = None
+
+
+def stripe_module(cfg):
+	# Returns the configured stripe module, setting the key (and optional mock apiBase) only when it changes.
+	# None if the stripe package is not installed.
+	global _stripe_settings
+	try:
+		import stripe
+	except ImportError:
+		return None
+	settings = (cfg.get('secretKey'), cfg.get('apiBase') or os.environ.get('STRIPE_API_BASE'))
+	if settings != _stripe_settings:
+		stripe.api_key = settings[0]
+		if settings[1]:
+			# e.g. http://localhost:12111 for stripe-mock
+			stripe.api_base = settings[1]
+		stripe.max_network_retries = 2
+		_stripe_settings = settings
+	return stripe
+
+
+# Checkout sessions are reused within a window of this many seconds and expire one window after it ends
+# (so 12-24h after creation; Stripe allows 30 minutes to 24 hours)
+CHECKOUT_WINDOW_SECONDS = 12 * 3600
+
+
+def checkout_key(fields):
+	# Checkouts of the same stored booking (same dates, total, URLs and window) map to the same Stripe idempotency key
+	digest = hashlib.sha256(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+	return 'checkout-' + digest[:40]
+
+
+def find_booking(booking_id):
+	# The stored booking whose ts is booking_id, or None
+	for msg in iter_messages():
+		if msg.get('type') == 'booking' and msg.get('ts') == booking_id:
+			return msg
+	return None
+
+
 @app.route('/api/checkout', methods=['POST'])
 def checkout():
+	# With "booking" (the id /api/book returned) and the booking's "email", the session is for the
+	# stored booking: its total is charged, and retries and double clicks get the same session.
+	# Without a booking every request creates a new session for the given name and amount.
 	cfg = load_config().get('stripe', {})
 	secret = cfg.get('secretKey')
 	public = cfg.get('publicKey')
-	if not (stripe and secret and public):
+	client = stripe_module(cfg) if (secret and public) else None
+	if not client:
 		return jsonify({ 'error': 'Stripe not configured' }), 400
-	stripe.api_key = secret
 	data = request.get_json(force=True)
-	name = data.get('name','Rental')
-	amount = int(float(data.get('amount', 0)) * 100)
 	currency = (cfg.get('currency') or 'usd')
+	success_url = data.get('successUrl') or request.host_url + 'vans'
+	cancel_url = data.get('cancelUrl') or request.host_url + 'vans'
+	booking_id = str(data.get('booking') or '').strip()
+	window = int(time.time() // CHECKOUT_WINDOW_SECONDS)
+	window_end = (window + 1) * CHECKOUT_WINDOW_SECONDS
+	key = None
+	if booking_id:
+		booking = find_booking(booking_id)
+		email = str(data.get('email') or '').strip().lower()
+		# the email has to match too, so a leaked booking id alone isn't enough
+		if not booking or not email or (booking.get('email') or '').strip().lower() != email:
+			return jsonify({ 'error': 'Booking not found' }), 404
+		van = get_catalog().get(booking.get('slug'))
+		name = f"{van.name if van else booking.get('slug')} {booking.get('start')} → {booking.get('end')}"
+		amount = int(round(float(booking.get('total') or 0) * 100))
+		key = checkout_key({
+			'booking': booking_id, 'email': email, 'name': name,
+			'slug': booking.get('slug'), 'start': booking.get('start'), 'end': booking.get('end'), 'amount': amount,
+			'currency': currency, 'success_url': success_url, 'cancel_url': cancel_url, 'window': window,
+		})
+	else:
+		name = data.get('name','Rental')
+		amount = int(float(data.get('amount', 0)) * 100)
 	if amount <= 0:
 		return jsonify({'error':'Invalid amount'}), 400
-	try:
-		session = stripe.checkout.Session.create(
+	def create_session():
+		options = { 'idempotency_key': key } if key else {}
+		session = client.checkout.Session.create(
 			mode='payment',
 			line_items=[{
 				'price_data': {
@@ -1065,12 +1961,30 @@ def checkout():
 				},
 				'quantity': 1
 			}],
-			success_url=data.get('successUrl') or request.host_url + 'vans',
-			cancel_url=data.get('cancelUrl') or request.host_url + 'vans'
+			success_url=success_url,
+			cancel_url=cancel_url,
+			# fixed per window, so a retried request sends the same parameters under the same key
+			expires_at=window_end + CHECKOUT_WINDOW_SECONDS,
+			**options
 		)
-		return jsonify({ 'url': session.url })
+		return { 'url': session.url }
+	try:
+		if key is None:
+			session = create_session()
+		else:
+			# double clicks (in any worker) wait for the first request instead of racing it to Stripe;
+			# the session is reused until the window ends, then the next request gets a new key
+			session = shared_cache.get_or_set(key, create_session, window_end - time.time())
 	except Exception as e:
 		return jsonify({ 'error': str(e) }), 500
+	return jsonify({ 'url': session['url'] })
+
+
+@app.before_request
+def hide_dot_static():
+	# dot files and directories under /static (in-progress uploads, .gitattributes) are not public
+	if request.path.startswith('/static/') and any(part.startswith('.') for part in request.path.split('/')):
+		return jsonify({"error": "not found"}), 404
 
 
 @app.route('/static/<path:path>')
@@ -1078,6 +1992,77 @@ def send_static(path):
 	return send_from_directory('static', path)
 
 
+@app.after_request
+def cache_uploads(response):
+	# content-addressed uploads never change under the same URL
+	if request.path.startswith('/static/images/uploads/') and response.status_code in (200, 304):
+		response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+	return response
+
+
+IMAGE_REF_RE = re.compile(r"static/images/([^\"'?#)\n]+)")
+
+
+def referenced_images():
+	# Relative paths under static/images mentioned anywhere in config.json or the static pages/scripts
+	refs = set()
+
+	def walk(value):
+		if isinstance(value, dict):
+			for v in value.values():
+				walk(v)
+		elif isinstance(value, list):
+			for v in value:
+				walk(v)
+		elif isinstance(value, str):
+			for m in IMAGE_REF_RE.finditer(value):
+				refs.add(unquote(m.group(1)).strip())
+
+	walk(load_config())
+	for name in os.listdir(STATIC_DIR):
+		if os.path.splitext(name)[1] in ('.html', '.js', '.css'):
+			with open(os.path.join(STATIC_DIR, name), 'r', encoding='utf-8', errors='ignore') as f:
+				walk(f.read())
+	return refs
+
+
+@app.cli.command('gc-images')
+@click.option('--delete', is_flag=True, help="Actually remove the files (default is a dry run).")
+def gc_images(delete):
+	"""Find image files no longer referenced by config.json or the static pages, and abandoned uploads."""
+	if not os.path.exists(CONFIG_PATH):
+		raise click.ClickException("config.json not found; refusing to treat every image as unreferenced")
+	refs = referenced_images()
+	orphans = []
+	stale_before = time.time() - UPLOAD_PART_MAX_AGE
+	for root, _, files in os.walk(IMAGES_DIR):
+		for name in files:
+			path = os.path.join(root, name)
+			rel = os.path.relpath(path, IMAGES_DIR).replace(os.sep, '/')
+			if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS and rel not in refs:
+				orphans.append((rel, os.path.getsize(path)))
+			elif name.endswith('.part') and os.path.getmtime(path) < stale_before:
+				# left behind by a worker killed mid-upload
+				orphans.append((rel, os.path.getsize(path)))
+	for rel, size in sorted(orphans):
+		click.echo(f"{size:>10}  {rel}")
+	total = sum(size for _, size in orphans)
+	if delete:
+		for rel, _ in orphans:
+			os.remove(os.path.join(IMAGES_DIR, rel))
+		# drop emptied hash buckets
+		if os.path.isdir(UPLOADS_DIR):
+			for name in os.listdir(UPLOADS_DIR):
+				bucket = os.path.join(UPLOADS_DIR, name)
+				if name != '.tmp' and os.path.isdir(bucket) and not os.listdir(bucket):
+					os.rmdir(bucket)
+		click.echo(f"Removed {len(orphans)} files, {total} bytes reclaimed")
+	else:
+		click.echo(f"{len(orphans)} unreferenced files, {total} bytes (dry run; pass --delete to remove)")
+
+
 if __name__ == "__main__":
+	# development server only; production runs through serve.py
 	port = int(os.environ.get("PORT", 5000))
+	warm_up()
 	app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+
+
+# Busy-day intervals for a van. Airbnb lists one VEVENT per block, including
+# past stays, overlapping and back-to-back blocks and events years out; these
+# helpers turn that into a sorted list of disjoint half-open [start, end) date
+# ranges clipped to the window the client asked for, or a per-day bitmap of it.
+
+DEFAULT_MONTHS = 18
+MAX_WINDOW_DAYS = 1100
+
+
+def as_date(value):
+	if isinstance(value, date):
+		return value
+	return date.fromisoformat(str(value)[:10])
+
+
+def merge(ranges):
+	# Sorted, disjoint (start, end) date pairs; overlapping and adjacent ranges are joined
+	pairs = sorted((as_date(r['start']), as_date(r['end'])) for r in ranges)
+	out = []
+	for start, end in pairs:
+		if end <= start:
+			# single-day events are sometimes listed with dtend == dtstart
+			end = start + timedelta(days=1)
+		if out and start <= out[-1][1]:
+			if end > out[-1][1]:
+				out[-1] = (out[-1][0], end)
+		else:
+			out.append((start, end))
+	return out
+
+
+def clip(pairs, start, end):
+	out = []
+	for s, e in pairs:
+		if e <= start:
+			continue
+		if s >= end:
+			break
+		out.append((max(s, start), min(e, end)))
+	return out
+
+
+def bitmap(pairs, start, end):
+	# One character per day of [start, end): '1' busy, '0' free
+	days = bytearray(b'0' * (end - start).days)
+	for s, e in clip(pairs, start, end):
+		i, j = (s - start).days, (e - start).days
+		days[i:j] = b'1' * (j - i)
+	return days.decode('ascii')
+
+
+def default_window(today=None):
+	# From the first of this month (what the calendar opens on) for DEFAULT_MONTHS months
+	today = today or date.today()
+	start = today.replace(day=1)
+	month = start.month - 1 + DEFAULT_MONTHS
+	return start, date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def parse_window(start_text, end_text, today=None):
+	# ?from=YYYY-MM-DD&to=YYYY-MM-DD (to is exclusive); raises ValueError on bad input
+	start, end = default_window(today)
+	if start_text:
+		start = as_date(start_text)
+		if not end_text:
+			end = start + (end - default_window(today)[0])
+	if end_text:
+		end = as_date(end_text)
+	if end <= start:
+		raise ValueError("to must be after from")
+	if (end - start).days > MAX_WINDOW_DAYS:
+		raise ValueError(f"window is limited to {MAX_WINDOW_DAYS} days")
+	return start, end
+
+
+def window_payload(pairs, start, end, fmt=None):
+	out = { "from": start.isoformat(), "to": end.isoformat() }
+	if fmt == 'bitmap':
+		out["days"] = bitmap(pairs, start, end)
+	else:
+		out["busy"] = [{ "start": s.isoformat(), "end": e.isoformat() } for s, e in clip(pairs, start, end)]
+	return out
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Caches for data fetched from upstream services (Airbnb iCal, ipapi.co, Stripe).
+#
+# Both backends have the same API: get(key), set(key, value, ttl), delete(key)
+# and get_or_set(key, compute, ttl). MemoryCache is a per-process LRU;
+# SQLiteCache is one file shared by every worker on the host, so N workers
+# don't each refetch the same feed. get_or_set takes a short lease on the key
+# before computing, so when an entry expires only one thread/worker refreshes
+# it and the others wait for its result.
+#
+# None is never cached (it means "missing"); SQLite values must be JSON.
+
+LEASE_SECONDS = 30
+POLL_SECONDS = 0.05
+
+
+class BaseCache:
+	lease_seconds = LEASE_SECONDS
+
+	def get_or_set(self, key, compute, ttl):
+		# ttl is seconds or a function of the computed value (<= 0: don't cache it)
+		value = self.get(key)
+		if value is not None:
+			return value
+		deadline = time.monotonic() + self.lease_seconds
+		while True:
+			if self.acquire(key):
+				try:
+					# whoever held the lease before us may have just stored it
+					value = self.get(key)
+					if value is None:
+						value = compute()
+						seconds = ttl(value) if callable(ttl) else ttl
+						if value is not None and seconds > 0:
+							self.set(key, value, seconds)
+					return value
+				finally:
+					self.release(key)
+			if time.monotonic() > deadline:
+				# the lease holder is stuck; don't make this request wait on it forever
+				return compute()
+			time.sleep(POLL_SECONDS)
+			value = self.get(key)
+			if value is not None:
+				return value
+
+
+class MemoryCache(BaseCache):
+	def __init__(self, maxsize=1024):
+		self.maxsize = maxsize
+		self.entries = OrderedDict()
+		self.leases = set()
+		self.guard = threading.Lock()
+
+	def get(self, key):
+		with self.guard:
+			entry = self.entries.get(key)
+			if entry is None:
+				return None
+			if entry[0] <= time.time():
+				del self.entries[key]
+				return None
+			self.entries.move_to_end(key)
+			return entry[1]
+
+	def set(self, key, value, ttl):
+		with self.guard:
+			self.entries[key] = (time.time() + ttl, value)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.maxsize:
+				self.entries.popitem(last=False)
+
+	def delete(self, key):
+		with self.guard:
+			self.entries.pop(key, None)
+
+	def acquire(self, key):
+		with self.guard:
+			if key in self.leases:
+				return False
+			self.leases.add(key)
+			return True
+
+	def release(self, key):
+		with self.guard:
+			self.leases.discard(key)
+
+
+class SQLiteFile:
+	# A SQLite file shared by every worker on the host. One connection per thread
+	# and process; connections are reopened after fork so workers forked from a
+	# preloaded master don't share the master's handle.
+	SCHEMA = ''
+
+	def __init__(self, path):
+		self.path = path
+		self.local = threading.local()
+		self.conn().executescript(self.SCHEMA)
+
+	def conn(self):
+		conn = getattr(self.local, 'conn', None)
+		if conn is None or self.local.pid != os.getpid():
+			# autocommit: every statement is its own transaction
+			conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+			conn.execute('PRAGMA journal_mode=WAL')
+			conn.execute('PRAGMA synchronous=NORMAL')
+			self.local.conn = conn
+			self.local.pid = os.getpid()
+		return conn
+
+
+class SQLiteCache(SQLiteFile, BaseCache):
+	SCHEMA = (
+		"CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL);"
+		"CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, until REAL NOT NULL);"
+	)
+	PRUNE_EVERY = 200
+
+	def __init__(self, path):
+		super().__init__(path)
+		self.writes = 0
+
+	def owner(self):
+		return f"{os.getpid()}:{threading.get_ident()}"
+
+	def get(self, key):
+		row = self.conn().execute('SELECT value, expires FROM entries WHERE key = ?', (key,)).fetchone()
+		if row is None or row[1] <= time.time():
+			return None
+		return json.loads(row[0])
+
+	def set(self, key, value, ttl):
+		now = time.time()
+		conn = self.conn()
+		conn.execute('INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)', (key, json.dumps(value), now + ttl))
+		self.writes += 1
+		if self.writes % self.PRUNE_EVERY == 0:
+			conn.execute('DELETE FROM entries WHERE expires <= ?', (now,))
+
+	def delete(self, key):
+		self.conn().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+	def acquire(self, key):
+		now = time.time()
+		conn = self.conn()
+		conn.execute('DELETE FROM leases WHERE key = ? AND until <= ?', (key, now))
+		cur = conn.execute('INSERT OR IGNORE INTO leases (key, owner, until) VALUES (?, ?, ?)', (key, self.owner(), now + self.lease_seconds))
+		return cur.rowcount == 1
+
+	def release(self, key):
+		self.conn().execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, self.owner()))
+
+
+def make_cache(backend, path):
+	# backend: 'sqlite' (shared across workers) or 'memory'; falls back to memory
+	# if the SQLite file can't be opened (e.g. read-only checkout)
+	if backend == 'sqlite':
+		try:
+			return SQLiteCache(path)
+		except Exception as e:
+			print(f"Shared cache at {path} unavailable, using in-process cache: {e}")
+	return MemoryCache()
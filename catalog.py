@@ -0,0 +1,52 @@
+import re
+
+
+# Compiled, read-only view of config["vans"]. Built once per config version
+# and shared by every route that needs to look a van up by slug.
+
+AIRBNB_ROOM_RE = re.compile(r"/ical/(\d+)")
+
+FIELDS = ('slug', 'name', 'airbnbIcalUrl', 'airbnbUrl')
+
+
+class Van:
+	# Only what the server reads is kept as attributes; the rest of the van is in payload
+	__slots__ = FIELDS + ('position', 'payload')
+
+	def __init__(self, raw, position):
+		for field in FIELDS:
+			setattr(self, field, raw.get(field))
+		self.slug = self.slug or ''
+		self.name = self.name or self.slug
+		self.position = position
+		if not self.airbnbUrl:
+			m = AIRBNB_ROOM_RE.search(self.airbnbIcalUrl or '')
+			if m:
+				self.airbnbUrl = f"https://www.airbnb.com/rooms/{m.group(1)}"
+		# the public JSON shape is fixed per config version, so build it once. raw comes from a
+		# freshly loaded config the catalog owns, so it's used as is rather than copied
+		if self.airbnbUrl:
+			raw['airbnbUrl'] = self.airbnbUrl
+		self.payload = raw
+
+	def __repr__(self):
+		return f"Van({self.slug!r})"
+
+
+class VanCatalog:
+	__slots__ = ('version', 'vans', 'by_slug', 'payload')
+
+	def __init__(self, raw_vans, version=None):
+		self.version = version
+		self.vans = tuple(Van(v, i) for i, v in enumerate(raw_vans or []) if isinstance(v, dict))
+		self.by_slug = { v.slug: v for v in self.vans }
+		self.payload = [v.payload for v in self.vans]
+
+	def get(self, slug):
+		return self.by_slug.get(slug)
+
+	def __iter__(self):
+		return iter(self.vans)
+
+	def __len__(self):
+		return len(self.vans)
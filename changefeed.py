@@ -0,0 +1,41 @@
+import json
+import time
+
+from cache import SQLiteFile
+
+
+# Append-only feed of admin-visible changes (new bookings and messages, booking
+# status changes, stats snapshots). Every change gets the next sequence number
+# from one SQLite file shared by all workers, so a client that has seen
+# sequence N can ask for everything after N, from any worker. Only the most
+# recent KEEP changes are kept; a client further behind than that reloads.
+
+KEEP = 5000
+
+
+class ChangeFeed(SQLiteFile):
+	SCHEMA = "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, kind TEXT NOT NULL, data TEXT NOT NULL);"
+
+	def append(self, kind, data):
+		conn = self.conn()
+		seq = conn.execute('INSERT INTO changes (ts, kind, data) VALUES (?, ?, ?)', (time.time(), kind, json.dumps(data, ensure_ascii=False))).lastrowid
+		if seq % 100 == 0:
+			conn.execute('DELETE FROM changes WHERE seq <= ?', (seq - KEEP,))
+		return seq
+
+	def latest(self):
+		# AUTOINCREMENT keeps counting after old rows are pruned
+		row = self.conn().execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+		return row[0] if row else 0
+
+	def oldest(self):
+		row = self.conn().execute('SELECT MIN(seq) FROM changes').fetchone()
+		return row[0] or 0
+
+	def since(self, seq, limit=500):
+		# (changes after seq, complete); complete is False if some changes after seq were
+		# pruned, or seq is from another feed (e.g. the file was deleted), and the client should reload
+		latest = self.latest()
+		complete = seq == latest or (seq < latest and self.oldest() <= seq + 1)
+		rows = self.conn().execute('SELECT seq, ts, kind, data FROM changes WHERE seq > ? ORDER BY seq LIMIT ?', (seq, limit)).fetchall()
+		return [{ 'seq': r[0], 'ts': r[1], 'kind': r[2], 'data': json.loads(r[3]) } for r in rows], complete
@@ -0,0 +1,128 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+
+# Negotiated gzip/brotli compression for responses above a size threshold.
+# Responses with an ETag (static files, and GET responses that get a content
+# hash ETag here) keep their compressed body in a small LRU, so the same
+# payload is not recompressed on every request.
+
+COMPRESSIBLE_TYPES = {
+	'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+	'application/json', 'image/svg+xml',
+}
+
+
+class CompressedBodyCache:
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		self._items = OrderedDict()
+		self._size = 0
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			body = self._items.get(key)
+			if body is not None:
+				self._items.move_to_end(key)
+			return body
+
+	def set(self, key, body):
+		if len(body) > self.max_bytes:
+			return
+		with self._lock:
+			old = self._items.pop(key, None)
+			if old is not None:
+				self._size -= len(old)
+			self._items[key] = body
+			self._size += len(body)
+			while self._size > self.max_bytes:
+				_, evicted = self._items.popitem(last=False)
+				self._size -= len(evicted)
+
+
+def negotiate(accept_encoding):
+	# Picks 'br' or 'gzip' from an Accept-Encoding header, honouring q=0
+	offered = {}
+	for part in (accept_encoding or '').split(','):
+		name, _, params = part.strip().partition(';')
+		q = 1.0
+		params = params.strip()
+		if params.startswith('q='):
+			try:
+				q = float(params[2:])
+			except ValueError:
+				q = 0.0
+		offered[name.strip().lower()] = q
+	star = offered.get('*', 0.0)
+	if brotli is not None and offered.get('br', star) > 0:
+		return 'br'
+	if offered.get('gzip', star) > 0:
+		return 'gzip'
+	return None
+
+
+def compress(body, encoding):
+	if encoding == 'br':
+		return brotli.compress(body, quality=5)
+	return gzip.compress(body, compresslevel=6)
+
+
+def init_compression(app):
+	app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+	app.config.setdefault('COMPRESS_CACHE_BYTES', 16 * 1024 * 1024)
+	cache = CompressedBodyCache(app.config['COMPRESS_CACHE_BYTES'])
+
+	@app.after_request
+	def compress_response(response):
+		if response.status_code != 200 or response.mimetype not in COMPRESSIBLE_TYPES:
+			return response
+		if 'Content-Encoding' in response.headers or 'Range' in request.headers:
+			return response
+		response.vary.add('Accept-Encoding')
+		file_backed = response.direct_passthrough
+		if response.is_streamed and not file_backed:
+			# generator responses (NDJSON streams) are left alone
+			return response
+		if request.method == 'GET' and not file_backed and not response.get_etag()[0]:
+			response.add_etag()
+			response.make_conditional(request)
+			if response.status_code != 200:
+				return response
+		encoding = negotiate(request.headers.get('Accept-Encoding'))
+		if not encoding:
+			return response
+		etag, _ = response.get_etag()
+		body = cache.get((etag, encoding)) if etag else None
+		if body is None:
+			if file_backed:
+				data = b''.join(response.response)
+				response.response.close()
+				response.direct_passthrough = False
+				response.set_data(data)
+			else:
+				data = response.get_data()
+			if len(data) < app.config['COMPRESS_MIN_SIZE']:
+				return response
+			body = compress(data, encoding)
+			if etag:
+				cache.set((etag, encoding), body)
+		elif file_backed:
+			response.response.close()
+		response.direct_passthrough = False
+		response.set_data(body)
+		response.headers['Content-Encoding'] = encoding
+		if etag:
+			# the compressed variant is not byte-identical, so only a weak match applies
+			response.set_etag(etag, weak=True)
+		return response
+
+	return cache
@@ -0,0 +1,106 @@
+import os
+import re
+from urllib.parse import urlsplit
+
+
+# Resource hints for the static HTML pages.
+#
+# Each page is scanned once (and again only if the file changes) for what the
+# browser would otherwise only discover while parsing it: stylesheets and
+# same-origin scripts (preload), the first images in the markup (preload),
+# GET /api/* calls made by inline or same-origin scripts (preload as fetch)
+# and third-party origins, including those imported from the stylesheets
+# (preconnect). The result is one Link header value per page.
+
+STYLESHEET_RE = re.compile(r"<link\b[^>]*\brel=[\"']stylesheet[\"'][^>]*\bhref=[\"']([^\"']+)[\"']", re.I)
+SCRIPT_RE = re.compile(r"<script\b[^>]*\bsrc=[\"']([^\"']+)[\"']", re.I)
+IMG_RE = re.compile(r"<img\b[^>]*\bsrc=[\"'](/static/[^\"']+)[\"']", re.I)
+# fetch('/api/...') with a literal URL; a second argument is checked for a non-GET method
+FETCH_RE = re.compile(r"fetch\(\s*(['\"`])(/api/[^'\"`$]*)\1\s*([,)])")
+METHOD_RE = re.compile(r"[^)]*?\bmethod\s*:\s*['\"](\w+)", re.S)
+CSS_IMPORT_RE = re.compile(r"@import\s+url\(\s*['\"]?(https?://[^'\")]+)", re.I)
+
+MAX_IMAGES = 2
+
+# origins that in turn load from another origin
+FOLLOW_ORIGINS = { 'https://fonts.googleapis.com': 'https://fonts.gstatic.com' }
+
+
+def origin(url):
+	parts = urlsplit(url)
+	return f"{parts.scheme}://{parts.netloc}" if parts.scheme and parts.netloc else None
+
+
+def read(path):
+	try:
+		with open(path, 'r', encoding='utf-8', errors='replace') as f:
+			return f.read()
+	except OSError:
+		return ''
+
+
+def api_calls(source):
+	calls = []
+	for m in FETCH_RE.finditer(source):
+		if m.group(3) == ',':
+			method = METHOD_RE.match(source, m.end())
+			if method and method.group(1).upper() != 'GET':
+				continue
+		calls.append(m.group(2))
+	return calls
+
+
+def scan_page(html, static_dir):
+	# Link header entries for one page, in the order the browser would need them
+	links, preconnect = [], []
+
+	def add(entry):
+		if entry not in links:
+			links.append(entry)
+
+	def local_file(url):
+		if url.startswith('/static/'):
+			return os.path.join(static_dir, url[len('/static/'):].split('?')[0])
+		return None
+
+	scripts = ''
+	for href in STYLESHEET_RE.findall(html):
+		if origin(href):
+			preconnect.append(origin(href))
+			continue
+		add(f"<{href}>; rel=preload; as=style")
+		path = local_file(href)
+		if path:
+			preconnect.extend(origin(u) for u in CSS_IMPORT_RE.findall(read(path)))
+	for src in SCRIPT_RE.findall(html):
+		if origin(src):
+			preconnect.append(origin(src))
+			continue
+		add(f"<{src}>; rel=preload; as=script")
+		path = local_file(src)
+		if path:
+			scripts += read(path)
+	for src in IMG_RE.findall(html)[:MAX_IMAGES]:
+		add(f"<{src}>; rel=preload; as=image")
+	for url in api_calls(html) + api_calls(scripts):
+		add(f"<{url}>; rel=preload; as=fetch; crossorigin")
+	for o in list(preconnect):
+		if o in FOLLOW_ORIGINS:
+			preconnect.append(FOLLOW_ORIGINS[o])
+	for o in preconnect:
+		add(f"<{o}>; rel=preconnect" + ('; crossorigin' if o in FOLLOW_ORIGINS.values() else ''))
+	return links
+
+
+class PageHints:
+	def __init__(self, static_dir):
+		self.static_dir = static_dir
+		self.pages = {}
+
+	def get(self, name, version=None):
+		# Link entries for static/<name>; version is a change marker for the file
+		cached = self.pages.get(name)
+		if cached is None or cached[0] != version:
+			html = read(os.path.join(self.static_dir, name))
+			cached = self.pages[name] = (version, scan_page(html, self.static_dir))
+		return cached[1]
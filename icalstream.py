@@ -0,0 +1,153 @@
+from datetime import date, datetime, timedelta, timezone
+
+
+# Streaming VEVENT extractor for availability feeds.
+#
+# Busy ranges only need DTSTART/DTEND of each VEVENT, so instead of building
+# an icalendar object tree for the whole feed this reads it line by line
+# (unfolding continuation lines), keeps just those two properties and drops
+# events outside the [start, end) window before anything is allocated for
+# them. It understands the forms Airbnb and most exporters use:
+#   DTSTART;VALUE=DATE:20261103
+#   DTSTART:20261103T150000Z
+#   DTSTART;TZID=Europe/Tbilisi:20261103T150000
+# Anything else (floating times, DURATION instead of DTEND, unknown TZIDs)
+# raises Unsupported, and the caller falls back to parse_calendar().
+#
+# Datetimes are converted to UTC before taking the date, as the icalendar
+# path always did.
+
+
+class Unsupported(ValueError):
+	pass
+
+
+def lines_of(chunks):
+	# Decoded, unfolded content lines from an iterable of text or bytes lines
+	current = None
+	for raw in chunks:
+		line = raw.decode('utf-8', 'replace') if isinstance(raw, bytes) else raw
+		line = line.rstrip('\r\n')
+		if not line:
+			# a CRLF split across two reads shows up as an empty line; it never ends a folded line
+			continue
+		if line[:1] in (' ', '\t'):
+			if current is not None:
+				current += line[1:]
+			continue
+		if current is not None:
+			yield current
+		current = line
+	if current is not None:
+		yield current
+
+
+def split_property(line):
+	# 'DTSTART;TZID="Europe/Tbilisi":20261103T150000' -> ('DTSTART', {'TZID': 'Europe/Tbilisi'}, '20261103T150000')
+	quoted = False
+	for i, ch in enumerate(line):
+		if ch == '"':
+			quoted = not quoted
+		elif ch == ':' and not quoted:
+			head, value = line[:i], line[i + 1:]
+			break
+	else:
+		raise Unsupported(f"malformed line: {line[:60]}")
+	name, _, rest = head.partition(';')
+	params = {}
+	if rest:
+		for part in rest.split(';'):
+			key, _, val = part.partition('=')
+			params[key.upper()] = val.strip('"')
+	return name.upper(), params, value.strip()
+
+
+def parse_value(params, value):
+	if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+		try:
+			return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+		except ValueError:
+			raise Unsupported(f"bad date: {value}")
+	if len(value) not in (15, 16) or value[8] != 'T':
+		raise Unsupported(f"bad date-time: {value}")
+	try:
+		dt = datetime(int(value[:4]), int(value[4:6]), int(value[6:8]), int(value[9:11]), int(value[11:13]), int(value[13:15]))
+	except ValueError:
+		raise Unsupported(f"bad date-time: {value}")
+	if value.endswith('Z'):
+		return dt.date()
+	tzid = params.get('TZID')
+	if not tzid:
+		# floating local time: leave it to icalendar
+		raise Unsupported(f"floating time: {value}")
+	from zoneinfo import ZoneInfo
+	try:
+		zone = ZoneInfo(tzid)
+	except Exception:
+		raise Unsupported(f"unknown TZID: {tzid}")
+	return dt.replace(tzinfo=zone).astimezone(timezone.utc).date()
+
+
+def busy_ranges(chunks, start=None, end=None):
+	# {"start": date, "end": date} per VEVENT overlapping [start, end) (either bound may be None)
+	depth = 0  # components nested inside the current VEVENT (VALARM etc.)
+	event = None
+	for line in lines_of(chunks):
+		name, _, value = line.partition(':')
+		name = name.upper()
+		if name == 'BEGIN':
+			if event is not None:
+				depth += 1
+			elif value.strip().upper() == 'VEVENT':
+				event = {}
+			continue
+		if name == 'END':
+			if event is not None and depth:
+				depth -= 1
+			elif event is not None:
+				if 'DTSTART' not in event or 'DTEND' not in event:
+					raise Unsupported("VEVENT without DTSTART/DTEND")
+				s, e = event['DTSTART'], event['DTEND']
+				if (start is None or e > start) and (end is None or s < end):
+					yield { "start": s, "end": e }
+				event = None
+			continue
+		if event is None or depth:
+			continue
+		if line[:8].upper().startswith(('DTSTART', 'DTEND', 'DURATION')):
+			prop, params, val = split_property(line)
+			if prop in ('DTSTART', 'DTEND'):
+				event[prop] = parse_value(params, val)
+			elif prop == 'DURATION':
+				raise Unsupported("DURATION instead of DTEND")
+
+
+def parse_calendar(text, start=None, end=None):
+	# The icalendar path: full object tree, used for feeds busy_ranges() can't read
+	# (e.g. DURATION instead of DTEND, or no end at all)
+	from icalendar import Calendar
+	from dateutil import tz
+	cal = Calendar.from_ical(text)
+	for component in cal.walk():
+		if component.name == "VEVENT":
+			if component.get("dtstart") is None:
+				continue
+			s = component.get("dtstart").dt
+			if component.get("dtend") is not None:
+				e = component.get("dtend").dt
+			elif component.get("duration") is not None:
+				e = s + component.get("duration").dt
+			elif isinstance(s, datetime):
+				# RFC 5545: without DTEND or DURATION the event ends when it starts...
+				e = s
+			else:
+				# ...or, for a DATE start, takes up that one day
+				e = s + timedelta(days=1)
+			if isinstance(s, datetime):
+				s = s.astimezone(tz.UTC)
+			if isinstance(e, datetime):
+				e = e.astimezone(tz.UTC)
+			s = date(s.year, s.month, s.day)
+			e = date(e.year, e.month, e.day)
+			if (start is None or e > start) and (end is None or s < end):
+				yield { "start": s, "end": e }
@@ -0,0 +1,96 @@
+import bisect
+import re
+
+
+# In-memory inverted index over messages.json (bookings and contact messages).
+# Tokens are lower-cased word runs; a sorted token list gives prefix matching
+# with two bisects. Messages are only ever appended, so syncing indexes just
+# the new tail and rebuilds only if earlier entries were rewritten.
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+FIELDS = ('name', 'email', 'phone', 'notes', 'message', 'slug', 'start', 'end')
+
+
+def tokenize(text):
+	return TOKEN_RE.findall(str(text or '').lower())
+
+
+class InvertedIndex:
+	def __init__(self):
+		self.postings = {}
+		self.tokens = []
+		# tokens added since the list was last sorted
+		self.new_tokens = []
+
+	def add(self, doc_id, text):
+		for token in set(tokenize(text)):
+			docs = self.postings.get(token)
+			if docs is None:
+				docs = self.postings[token] = set()
+				self.new_tokens.append(token)
+			docs.add(doc_id)
+
+	def sort_tokens(self):
+		# One sort per batch of adds instead of an insort per new token; the list is
+		# already a sorted run plus a tail, which sort() merges in about linear time
+		if self.new_tokens:
+			self.tokens.extend(self.new_tokens)
+			self.tokens.sort()
+			self.new_tokens = []
+
+	def lookup(self, token, prefix=False):
+		if not prefix:
+			return self.postings.get(token, set())
+		self.sort_tokens()
+		lo = bisect.bisect_left(self.tokens, token)
+		hi = bisect.bisect_left(self.tokens, token + '\U0010ffff')
+		out = set()
+		for t in self.tokens[lo:hi]:
+			out |= self.postings[t]
+		return out
+
+	def search(self, query, prefix=True):
+		# Every query term must match; terms match as prefixes unless prefix=False
+		terms = tokenize(query)
+		if not terms:
+			return set()
+		# rarest term first keeps the running intersection small
+		matches = sorted((self.lookup(t, prefix) for t in terms), key=len)
+		result = set(matches[0])
+		for docs in matches[1:]:
+			result &= docs
+			if not result:
+				break
+		return result
+
+
+class MessageSearch:
+	def __init__(self):
+		self.index = InvertedIndex()
+		self.messages = []
+
+	def sync(self, messages):
+		n = len(self.messages)
+		if len(messages) < n or (n and messages[n - 1].get('ts') != self.messages[n - 1].get('ts')):
+			self.__init__()
+			n = 0
+		for i in range(n, len(messages)):
+			msg = messages[i]
+			self.index.add(i, ' '.join(str(msg.get(f) or '') for f in FIELDS))
+		self.index.sort_tokens()
+		# keep the latest copies so status changes show up in results
+		self.messages = messages
+
+	def search(self, query, kind=None, status=None):
+		# Matching messages, newest first, as (position, message) pairs
+		out = []
+		for i in sorted(self.index.search(query), reverse=True):
+			msg = self.messages[i]
+			is_booking = msg.get('type') == 'booking'
+			if kind == 'booking' and not is_booking or kind == 'message' and is_booking:
+				continue
+			if status and (msg.get('status') or 'pending') != status:
+				continue
+			out.append((i, msg))
+		return out
@@ -0,0 +1,74 @@
+import argparse
+import multiprocessing
+import os
+
+
+# Production entry point: python serve.py [--workers N] [--threads N] [--port N]
+#
+# Runs the app under gunicorn (prefork workers with threads) where available,
+# or waitress (threads only) on Windows. The app is imported and warmed up
+# once before any worker accepts traffic, and buffered state is flushed when
+# a worker or the server shuts down.
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description="Run the site under a production WSGI server")
+	parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+	parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+	parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)))
+	parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)))
+	parser.add_argument('--timeout', type=int, default=int(os.environ.get('WEB_TIMEOUT', 30)), help="seconds before a stuck worker is restarted")
+	parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 20)), help="seconds workers get to finish requests on shutdown")
+	return parser.parse_args(argv)
+
+
+def load_app():
+	import app as site
+	site.warm_up()
+	return site
+
+
+def run_gunicorn(args):
+	from gunicorn.app.base import BaseApplication
+
+	class SiteApplication(BaseApplication):
+		def load_config(self):
+			self.cfg.set('bind', f"{args.host}:{args.port}")
+			self.cfg.set('workers', args.workers)
+			self.cfg.set('threads', args.threads)
+			self.cfg.set('worker_class', 'gthread')
+			self.cfg.set('timeout', args.timeout)
+			self.cfg.set('graceful_timeout', args.graceful_timeout)
+			# import and warm the app in the master so every forked worker starts warm
+			self.cfg.set('preload_app', True)
+			self.cfg.set('worker_exit', lambda server, worker: self.site.flush_state())
+			self.cfg.set('on_exit', lambda server: self.site.flush_state())
+
+		def load(self):
+			self.site = load_app()
+			return self.site.app
+
+	SiteApplication().run()
+
+
+def run_waitress(args):
+	import waitress
+	site = load_app()
+	try:
+		waitress.serve(site.app, host=args.host, port=args.port, threads=max(1, args.workers * args.threads))
+	finally:
+		site.flush_state()
+
+
+def main(argv=None):
+	args = parse_args(argv)
+	try:
+		import gunicorn  # noqa: F401
+	except ImportError:
+		run_waitress(args)
+	else:
+		run_gunicorn(args)
+
+
+if __name__ == "__main__":
+	main()
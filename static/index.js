@@ -15,6 +15,7 @@ async function loadFeaturedVehicles() {
 			const card = document.createElement('a');
 			card.className = 'card v';
 			card.href = `/van/${van.slug}`;
+			card.dataset.slug = van.slug;
 			
 			const imageUrl = van.imageUrl || (van.photos && van.photos[0]) || '/static/images/placeholder.jpg';
 			const price = van.pricePerNight ? `€${van.pricePerNight} / night` : 'Ask for details';
@@ -60,6 +61,7 @@ async function loadFeaturedVehicles() {
 			
 			container.appendChild(comingSoonCard);
 		}
+		markWeekendAvailability(container);
 	} catch (error) {
 		console.error('Error loading vehicles:', error);
 	}
@@ -82,3 +82,27 @@
 	}
 })();
 
+// "Available this weekend" badges from one batched availability request for all listed vans
+// (shared by the home and vans pages, which load this file first)
+function localISO(d) { return `${d.getFullYear()}-${String(d.getMonth()+1).padStart(2,'0')}-${String(d.getDate()).padStart(2,'0')}`; }
+async function markWeekendAvailability(container) {
+	const today = new Date();
+	today.setHours(0, 0, 0, 0);
+	// Saturday and Sunday of this weekend (just Sunday if today is Sunday)
+	const from = new Date(today);
+	if (today.getDay() !== 0) from.setDate(today.getDate() + (6 - today.getDay()));
+	const to = new Date(today);
+	to.setDate(today.getDate() + ((8 - today.getDay()) % 7 || 7));
+	try {
+		const res = await fetch(`/api/availability?fleet=1&format=bitmap&from=${localISO(from)}&to=${localISO(to)}`);
+		if (!res.ok) return;
+		const data = await res.json();
+		(data.vans || []).forEach(v => {
+			if (typeof v.days !== 'string' || v.days.includes('1')) return;
+			const title = container.querySelector(`[data-slug="${CSS.escape(v.slug)}"] .title`);
+			if (title) title.insertAdjacentHTML('beforeend', ' <span class="badge">Available this weekend</span>');
+		});
+	} catch (error) {
+		console.error('Error loading availability:', error);
+	}
+}
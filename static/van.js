@@ -3,18 +3,10 @@ function getSlug() {
 	return parts[1];
 }
 
-async function fetchVans() {
-	const res = await fetch('/api/vans');
-	return await res.json();
-}
-
-async function fetchAvailability(slug) {
-	const res = await fetch(`/api/availability?slug=${encodeURIComponent(slug)}`);
-	return await res.json();
-}
-
-async function fetchSite() {
-	const res = await fetch('/api/site');
+// Van record, availability (as a per-day bitmap) and site contact info in a single request
+async function fetchBundle(slug) {
+	const res = await fetch(`/api/vans/${encodeURIComponent(slug)}/bundle?format=bitmap`);
+	if (!res.ok) return null;
 	return await res.json();
 }
 
@@ -25,6 +17,9 @@ let monthOffset = 0;
 let rangeStart = null;
 let rangeEnd = null;
 let currentBusy = [];
+let busyFrom = null;
+let busyTo = null;
+let busyDays = '';
 let currentPrice = 0;
 let contactPhone = '';
 let contactEmail = '';
@@ -33,7 +28,20 @@ let stripePublic = '';
 
 function addDays(d, n) { const x = new Date(d); x.setDate(x.getDate()+n); return x; }
 
+// Days outside the bitmap's window are unknown, not free
+function isOutsideWindow(d) {
+	if (!busyFrom) return false;
+	const day = new Date(d.getFullYear(), d.getMonth(), d.getDate());
+	return day < busyFrom || day >= busyTo;
+}
+
 function isBusyDate(d) {
+	if (busyFrom) {
+		// unknown days count as busy so a range can't be selected across them
+		if (isOutsideWindow(d)) return true;
+		const i = Math.round((new Date(d.getFullYear(), d.getMonth(), d.getDate()) - busyFrom) / (1000*60*60*24));
+		return busyDays.charAt(i) === '1';
+	}
 	return currentBusy.some(r => {
 		const start = isoToDate(r.start);
 		const end = isoToDate(r.end);
@@ -229,6 +237,15 @@ function renderCalendar() {
 	const monthLabel = document.getElementById('month');
 	cal.innerHTML = '';
 	const now = new Date();
+	if (busyFrom) {
+		// only the months the bitmap covers can be shown; prev/next stop at its ends
+		const monthsFromNow = (d) => (d.getFullYear() - now.getFullYear()) * 12 + d.getMonth() - now.getMonth();
+		const minOffset = monthsFromNow(busyFrom), maxOffset = monthsFromNow(addDays(busyTo, -1));
+		monthOffset = Math.max(minOffset, Math.min(maxOffset, monthOffset));
+		const prevBtn = document.getElementById('prev'), nextBtn = document.getElementById('next');
+		if (prevBtn) prevBtn.disabled = monthOffset <= minOffset;
+		if (nextBtn) nextBtn.disabled = monthOffset >= maxOffset;
+	}
 	const base = new Date(now.getFullYear(), now.getMonth() + monthOffset, 1);
 	const end = new Date(base.getFullYear(), base.getMonth()+1, 0);
 	monthLabel.textContent = base.toLocaleString(undefined, { month: 'long', year: 'numeric' });
@@ -241,7 +258,7 @@ function renderCalendar() {
 		const busy = isBusyDate(d);
 		const inMonth = d.getMonth()===base.getMonth();
 		const div = document.createElement('div');
-		div.className = 'cell ' + (busy ? 'busy' : 'free') + (inMonth ? '' : ' dim') + (isInRange(d) ? ' selected' : '');
+		div.className = 'cell ' + (isOutsideWindow(d) ? 'disabled' : busy ? 'busy' : 'free') + (inMonth ? '' : ' dim') + (isInRange(d) ? ' selected' : '');
 		div.textContent = String(d.getDate());
 		div.addEventListener('click', () => {
 			if (!inMonth || busy) return;
@@ -343,8 +360,8 @@ function renderGallery(van) {
 
 (async function init() {
 	const slug = getSlug();
-	const vans = await fetchVans();
-	currentVan = vans.find(v => v.slug === slug);
+	const bundle = await fetchBundle(slug);
+	currentVan = bundle && bundle.van;
 	if (!currentVan) { document.getElementById('van-name').textContent = 'Not found'; return; }
 	// Use plain name without emojis
 	document.getElementById('van-name').textContent = currentVan.name;
@@ -423,12 +440,18 @@ function renderGallery(van) {
 		}
 	   }
 	currentPrice = currentVan.pricePerNight || 0;
-	const site = await fetchSite();
+	const site = bundle.site;
 	contactPhone = (site && site.contact && site.contact.whatsapp) || '';
 	contactEmail = (site && site.contact && site.contact.email) || '';
 	stripePublic = (site && site.stripe && site.stripe.publicKey) || '';
-	const data = await fetchAvailability(slug);
-	currentBusy = data.busy || [];
+	const availability = bundle.availability || {};
+	if (typeof availability.days === 'string') {
+		busyFrom = isoToDate(availability.from);
+		busyDays = availability.days;
+		busyTo = addDays(busyFrom, busyDays.length);
+	} else {
+		currentBusy = availability.busy || [];
+	}
 	renderCalendar();
 	document.getElementById('prev').addEventListener('click', (e) => { e.preventDefault(); e.stopImmediatePropagation(); monthOffset--; renderCalendar && renderCalendar(); });
 	document.getElementById('next').addEventListener('click', (e) => { e.preventDefault(); e.stopImmediatePropagation(); monthOffset++; renderCalendar && renderCalendar(); });
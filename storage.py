@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+	import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+	fcntl = None
+
+
+# The JSON data files (config.json, messages.json, stats.json) are read and
+# rewritten by every worker. write_json() writes a temp file next to the target
+# and renames it over, so a reader in another worker sees the old file or the
+# new one, never a truncated one. locked() serializes a read-modify-write of a
+# file across threads and workers with a flock on <path>.lock, like VisitLog.
+
+_thread_locks = {}
+_guard = threading.Lock()
+
+
+def write_json(path, data):
+	folder = os.path.dirname(path) or '.'
+	fd, tmp = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+	try:
+		with os.fdopen(fd, 'w', encoding='utf-8') as f:
+			json.dump(data, f, ensure_ascii=False, indent=2)
+		# mkstemp creates the file 0600; keep the mode the file had
+		try:
+			mode = os.stat(path).st_mode & 0o777
+		except OSError:
+			mode = 0o644
+		os.chmod(tmp, mode)
+		os.replace(tmp, path)
+	except BaseException:
+		try:
+			os.unlink(tmp)
+		except OSError:
+			pass
+		raise
+
+
+@contextmanager
+def locked(path):
+	with _guard:
+		thread_lock = _thread_locks.setdefault(path, threading.Lock())
+	with thread_lock:
+		with open(path + '.lock', 'a') as lock_file:
+			if fcntl:
+				fcntl.flock(lock_file, fcntl.LOCK_EX)
+			try:
+				yield
+			finally:
+				if fcntl:
+					fcntl.flock(lock_file, fcntl.LOCK_UN)
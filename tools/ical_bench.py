@@ -0,0 +1,114 @@
+import argparse, io, os, sys, time, tracemalloc
+from datetime import date, timedelta
+
+# Benchmarks the streaming iCal parser (icalstream.busy_ranges) against the
+# icalendar object-tree path on the same feed, and checks both return the
+# same busy ranges for the window. It first checks that the events the
+# streaming parser hands over to icalendar (DURATION, no DTEND) parse there.
+#
+#   python tools/ical_bench.py --events 5000
+#   python tools/ical_bench.py --file airbnb.ics --runs 5
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import icalstream  # noqa: E402
+
+
+def synthetic_feed(events):
+	# Airbnb-style feed: one all-day VEVENT every few days, newest last, going back years
+	today = date.today()
+	lines = ['BEGIN:VCALENDAR', 'PRODID:-//Airbnb Inc//Hosting Calendar 0.8.8//EN', 'CALSCALE:GREGORIAN', 'VERSION:2.0']
+	day = today - timedelta(days=4 * events)
+	for i in range(events):
+		end = day + timedelta(days=2 + i % 3)
+		lines += [
+			'BEGIN:VEVENT',
+			'DTEND;VALUE=DATE:' + end.strftime('%Y%m%d'),
+			'DTSTART;VALUE=DATE:' + day.strftime('%Y%m%d'),
+			f'UID:{i:08x}-bench@airbnb.com',
+			'DESCRIPTION:Reservation URL: https://www.airbnb.com/hosting/reservations/details/HM',
+			f' {i:08X}\\nPhone Number (Last 4 Digits): {i % 10000:04d}',
+			'SUMMARY:Reserved',
+			'END:VEVENT',
+		]
+		day = end + timedelta(days=2)
+	lines.append('END:VCALENDAR')
+	return '\r\n'.join(lines) + '\r\n'
+
+
+# (VEVENT properties, expected start, expected end) for feeds busy_ranges() passes to parse_calendar()
+FALLBACK_CASES = [
+	(['DTSTART;VALUE=DATE:20261103', 'DURATION:P2D'], date(2026, 11, 3), date(2026, 11, 5)),
+	(['DTSTART;VALUE=DATE:20261110'], date(2026, 11, 10), date(2026, 11, 11)),
+	(['DTSTART:20261112T100000Z', 'DURATION:PT3H'], date(2026, 11, 12), date(2026, 11, 12)),
+	(['DTSTART:20261114T100000Z'], date(2026, 11, 14), date(2026, 11, 14)),
+]
+
+
+def check_fallback():
+	ok = True
+	for props, start, end in FALLBACK_CASES:
+		text = '\r\n'.join(['BEGIN:VCALENDAR', 'VERSION:2.0', 'BEGIN:VEVENT', 'UID:x@bench'] + props + ['END:VEVENT', 'END:VCALENDAR']) + '\r\n'
+		try:
+			list(icalstream.busy_ranges(io.BytesIO(text.encode('utf-8'))))
+			print(f"  {' '.join(props)}: streaming parser did not hand it over")
+			ok = False
+		except icalstream.Unsupported:
+			pass
+		got = list(icalstream.parse_calendar(text))
+		if got != [{ 'start': start, 'end': end }]:
+			print(f"  {' '.join(props)}: expected {start}..{end}, got {got}")
+			ok = False
+	print('fallback cases:', 'OK' if ok else 'FAILED')
+	return ok
+
+
+def measure(fn, runs):
+	best = None
+	for _ in range(runs):
+		started = time.perf_counter()
+		result = fn()
+		elapsed = time.perf_counter() - started
+		best = elapsed if best is None else min(best, elapsed)
+	tracemalloc.start()
+	fn()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return result, best * 1000, peak / 1024
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--file', help="an .ics file to parse instead of a synthetic feed")
+	parser.add_argument('--events', type=int, default=5000)
+	parser.add_argument('--runs', type=int, default=3)
+	parser.add_argument('--history-days', type=int, default=400, help="window start, days before today (as the app uses)")
+	parser.add_argument('--future-days', type=int, default=3 * 366)
+	args = parser.parse_args()
+
+	if not check_fallback():
+		sys.exit(1)
+	if args.file:
+		with open(args.file, 'rb') as f:
+			text = f.read().decode('utf-8', 'replace')
+	else:
+		text = synthetic_feed(args.events)
+	raw = text.encode('utf-8')
+	start = date.today() - timedelta(days=args.history_days)
+	end = date.today() + timedelta(days=args.future_days)
+
+	# what the app used to do: build the tree for every event, then filter
+	old, old_ms, old_kb = measure(lambda: [r for r in icalstream.parse_calendar(text) if r['end'] > start and r['start'] < end], args.runs)
+	new, new_ms, new_kb = measure(lambda: list(icalstream.busy_ranges(io.BytesIO(raw), start, end)), args.runs)
+
+	print(f"feed: {len(raw) / 1024:.0f} KB, {text.count('BEGIN:VEVENT')} events, {len(new)} in window {start}..{end}")
+	print(f"  icalendar : {old_ms:8.1f} ms  peak {old_kb:9.0f} KB")
+	print(f"  streaming : {new_ms:8.1f} ms  peak {new_kb:9.0f} KB  ({old_ms / new_ms if new_ms else 0:.1f}x faster)")
+	if old != new:
+		print('MISMATCH: the two parsers disagree')
+		sys.exit(1)
+	print('OK')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,73 @@
+import argparse, os, subprocess, sys, time
+
+# Cold-start benchmark for app.py.
+#
+# Imports the app in a fresh interpreter with -X importtime, prints the
+# cumulative import time per top-level dependency, and exits non-zero if the
+# cold start exceeds the budget or if a dependency that should be loaded
+# lazily (on first use of its route) was imported at startup.
+#
+#   python tools/startup_bench.py --budget-ms 400 --runs 5
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = ['requests', 'icalendar', 'dateutil', 'smtplib', 'email.mime', 'email_validator', 'stripe', 'numpy']
+
+
+def run_once():
+	started = time.perf_counter()
+	proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, capture_output=True, text=True)
+	wall = (time.perf_counter() - started) * 1000
+	if proc.returncode != 0:
+		print(proc.stderr)
+		sys.exit(proc.returncode)
+	modules = {}
+	direct, pending = [], []
+	for line in proc.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		self_us, cumulative_us, name = line[len('import time:'):].split('|')
+		name = name.rstrip()
+		# importtime indents nested imports by two spaces per level and lists children before their parent
+		depth = (len(name) - len(name.lstrip()) - 1) // 2
+		name = name.strip()
+		modules[name] = int(cumulative_us)
+		if depth == 1:
+			pending.append((int(cumulative_us), name))
+		elif depth == 0:
+			if name == 'app':
+				direct = pending
+			pending = []
+	return wall, modules, direct
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 400)))
+	parser.add_argument('--runs', type=int, default=3)
+	parser.add_argument('--top', type=int, default=15)
+	args = parser.parse_args()
+
+	results = [run_once() for _ in range(args.runs)]
+	# best run is the least noisy estimate of cold start
+	wall, modules, direct = min(results, key=lambda r: r[0])
+	app_ms = modules.get('app', 0) / 1000
+
+	print(f"cold start: {wall:.1f} ms wall (interpreter + import), import app: {app_ms:.1f} ms, best of {args.runs}")
+	for us, name in sorted(direct, reverse=True)[:args.top]:
+		print(f"  {us / 1000:8.1f} ms  {name}")
+
+	failed = False
+	eager = [name for name in LAZY if name in modules]
+	if eager:
+		print('imported at startup but should be lazy: ' + ', '.join(eager))
+		failed = True
+	if app_ms > args.budget_ms:
+		print(f"import app took {app_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+		failed = True
+	print('FAIL' if failed else 'OK')
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,37 @@
+import requests, sys
+
+# Checks /api/checkout against a local Stripe mock instead of the real API.
+#
+# 1) Run stripe-mock:  docker run --rm -p 12111-12112:12111-12112 stripe/stripe-mock
+# 2) In config.json set "stripe": {"publicKey": "pk_test_123", "secretKey": "sk_test_123",
+#    "apiBase": "http://localhost:12111"}  (or export STRIPE_API_BASE instead of apiBase)
+# 3) Start the server (python app.py) and run this script (optionally with a van slug).
+
+BASE = 'http://127.0.0.1:5000'
+
+# checkout charges a stored booking, so make one first (slug must be a van in config.json)
+SLUG = sys.argv[1] if len(sys.argv) > 1 else 'red-van'
+booked = requests.post(BASE + '/api/book', json={'slug': SLUG, 'start': '2030-01-01', 'end': '2030-01-04', 'nights': 3, 'total': 123.45, 'email': 'mock@example.com'}, timeout=30)
+print('booking ->', booked.status_code, booked.text)
+payload = {'booking': booked.json().get('booking'), 'email': 'mock@example.com'}
+
+first = requests.post(BASE + '/api/checkout', json=payload, timeout=30)
+print('first checkout ->', first.status_code, first.text)
+if first.status_code != 200:
+    print('Checkout failed, aborting'); sys.exit(1)
+
+again = requests.post(BASE + '/api/checkout', json=payload, timeout=30)
+print('repeat checkout ->', again.status_code, again.text)
+if again.json().get('url') != first.json().get('url'):
+    print('Repeat request returned a different session'); sys.exit(1)
+
+unknown = requests.post(BASE + '/api/checkout', json=dict(payload, booking='no-such-booking'), timeout=30)
+print('unknown booking ->', unknown.status_code, unknown.text)
+if unknown.status_code != 404:
+    print('Unknown booking was not rejected'); sys.exit(1)
+
+anonymous = [requests.post(BASE + '/api/checkout', json={'name': 'Mock rental', 'amount': 123.45}, timeout=30) for _ in range(2)]
+# stripe-mock answers with a fixture, so only the status is checked here
+print('without booking ->', [r.status_code for r in anonymous])
+
+print('Done')
@@ -0,0 +1,196 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from datetime import date
+
+try:
+	import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+	fcntl = None
+
+
+# Raw visit events are kept in rotating gzip segments of NDJSON lines.
+# Each flush writes one independent gzip member, and a sidecar ``.idx`` file
+# records one line per member: {"offset", "length", "first", "last", "count"}.
+# A time-range query only opens the segments whose range overlaps, and inside
+# a segment only decompresses the members that can contain matching events.
+
+SEGMENT_SUFFIX = '.ndjson.gz'
+INDEX_SUFFIX = '.idx'
+
+
+# ISO date, or date and UTC time to any precision, as stored in event timestamps
+BOUND_RE = re.compile(r"\d{4}-\d{2}-\d{2}(T\d{2}(:\d{2}(:\d{2}(\.\d+)?)?)?Z?)?")
+
+
+def time_bound(value, upper=False):
+	# ISO timestamps compare lexicographically; a bare date as an upper bound
+	# should include the whole day. None for an empty value; ValueError for
+	# anything that isn't an ISO date or datetime.
+	if not value:
+		return None
+	value = str(value).strip()
+	try:
+		if not BOUND_RE.fullmatch(value):
+			raise ValueError
+		date.fromisoformat(value[:10])
+	except ValueError:
+		raise ValueError(f"not an ISO date or datetime: {value}")
+	if upper and len(value) == 10:
+		return value + 'T99'
+	return value
+
+
+class VisitLog:
+	def __init__(self, root, segment_bytes=4 * 1024 * 1024, flush_events=50, flush_seconds=5.0):
+		self.root = root
+		self.segment_bytes = segment_bytes
+		self.flush_events = flush_events
+		self.flush_seconds = flush_seconds
+		self._buffer = []
+		self._last_flush = time.monotonic()
+		self._lock = threading.Lock()
+		self._timer = None
+		self._timer_pid = None
+
+	def append(self, event):
+		with self._lock:
+			self._buffer.append(event)
+			due = len(self._buffer) >= self.flush_events or (time.monotonic() - self._last_flush) >= self.flush_seconds
+			if not due and (self._timer is None or self._timer_pid != os.getpid()):
+				# a quiet worker still writes its buffer out within flush_seconds, so other
+				# workers' queries see it and a killed worker loses at most that much.
+				# A timer inherited from the master over fork doesn't run in the child.
+				self._timer = threading.Timer(self.flush_seconds, self.flush)
+				self._timer.daemon = True
+				self._timer_pid = os.getpid()
+				self._timer.start()
+		if due:
+			self.flush()
+
+	def flush(self):
+		with self._lock:
+			events, self._buffer = self._buffer, []
+			self._last_flush = time.monotonic()
+			if self._timer is not None:
+				self._timer.cancel()
+				self._timer = None
+		if not events:
+			return 0
+		events.sort(key=lambda e: e.get('ts') or '')
+		payload = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in events).encode('utf-8')
+		member = gzip.compress(payload, compresslevel=6)
+		os.makedirs(self.root, exist_ok=True)
+		lock_path = os.path.join(self.root, '.lock')
+		with open(lock_path, 'a') as lock_file:
+			if fcntl:
+				fcntl.flock(lock_file, fcntl.LOCK_EX)
+			try:
+				segment = self._current_segment(events[0].get('ts') or '')
+				with open(segment, 'ab') as f:
+					offset = f.tell()
+					f.write(member)
+				entry = {
+					'offset': offset,
+					'length': len(member),
+					'first': events[0].get('ts'),
+					'last': events[-1].get('ts'),
+					'count': len(events),
+				}
+				with open(segment[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'a', encoding='utf-8') as f:
+					f.write(json.dumps(entry) + '\n')
+			finally:
+				if fcntl:
+					fcntl.flock(lock_file, fcntl.LOCK_UN)
+		return len(events)
+
+	def _current_segment(self, first_ts):
+		names = self._segment_names()
+		if names:
+			path = os.path.join(self.root, names[-1])
+			if os.path.getsize(path) < self.segment_bytes:
+				return path
+		# segment names sort by the first timestamp they hold
+		stamp = ''.join(ch for ch in first_ts if ch.isdigit())[:20] or str(int(time.time() * 1000000))
+		name = f"visits-{stamp}{SEGMENT_SUFFIX}"
+		while name in names:
+			stamp += '0'
+			name = f"visits-{stamp}{SEGMENT_SUFFIX}"
+		return os.path.join(self.root, name)
+
+	def _segment_names(self):
+		if not os.path.isdir(self.root):
+			return []
+		return sorted(n for n in os.listdir(self.root) if n.endswith(SEGMENT_SUFFIX))
+
+	def _read_index(self, segment):
+		blocks = []
+		try:
+			with open(segment[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+				for line in f:
+					line = line.strip()
+					if line:
+						blocks.append(json.loads(line))
+		except (OSError, ValueError):
+			pass
+		return blocks
+
+	def segments(self):
+		out = []
+		for name in self._segment_names():
+			path = os.path.join(self.root, name)
+			blocks = self._read_index(path)
+			if not blocks:
+				continue
+			out.append({
+				'name': name,
+				'bytes': os.path.getsize(path),
+				'count': sum(b.get('count', 0) for b in blocks),
+				'first': min(b['first'] for b in blocks),
+				'last': max(b['last'] for b in blocks),
+			})
+		return out
+
+	def count(self):
+		with self._lock:
+			pending = len(self._buffer)
+		return sum(seg['count'] for seg in self.segments()) + pending
+
+	def query(self, start=None, end=None, limit=None, reverse=False):
+		# Yields events with start <= ts <= end, oldest first (newest first with
+		# reverse=True). Buffered events that are not flushed yet are included.
+		lo = time_bound(start)
+		hi = time_bound(end, upper=True)
+		emitted = 0
+		for ev in self._iter_range(lo, hi, reverse):
+			ts = ev.get('ts') or ''
+			if (lo and ts < lo) or (hi and ts > hi):
+				continue
+			yield ev
+			emitted += 1
+			if limit and emitted >= limit:
+				return
+
+	def _iter_range(self, lo, hi, reverse):
+		with self._lock:
+			pending = sorted(self._buffer, key=lambda e: e.get('ts') or '', reverse=reverse)
+		if reverse:
+			yield from pending
+		names = self._segment_names()
+		for name in (reversed(names) if reverse else names):
+			path = os.path.join(self.root, name)
+			blocks = [b for b in self._read_index(path)
+				if not (lo and b['last'] < lo) and not (hi and b['first'] > hi)]
+			if not blocks:
+				continue
+			with open(path, 'rb') as f:
+				for b in (reversed(blocks) if reverse else blocks):
+					f.seek(b['offset'])
+					lines = gzip.decompress(f.read(b['length'])).splitlines()
+					for line in (reversed(lines) if reverse else lines):
+						yield json.loads(line)
+		if not reverse:
+			yield from pending